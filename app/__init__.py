@@ -4,12 +4,13 @@ from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_mail import Mail
 from itsdangerous import URLSafeTimedSerializer
-import sqlalchemy
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+from app.db_engine import opcoes_engine, ReplicaPool, RoutingSession
+
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
 app = Flask(__name__,
@@ -18,6 +19,7 @@ app = Flask(__name__,
 
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///projeto.db')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
 app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
 app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
@@ -42,7 +44,22 @@ app.config['API_KEY'] = os.getenv('API_KEY')
 app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-database = SQLAlchemy(app)
+# Cache de identidade do user_loader (por processo)
+app.config['IDENTITY_CACHE_TTL'] = float(os.getenv('IDENTITY_CACHE_TTL', 30))
+app.config['IDENTITY_CACHE_SIZE'] = int(os.getenv('IDENTITY_CACHE_SIZE', 1024))
+
+# Fotos de perfil: 'local' (instance/fotos) ou 'r2'
+app.config['FOTOS_STORAGE'] = os.getenv('FOTOS_STORAGE', 'local')
+app.config['FOTOS_STORAGE_DIR'] = os.getenv('FOTOS_STORAGE_DIR')
+
+# Réplicas de leitura (opcional): URLs separadas por vírgula
+app.config['DATABASE_REPLICA_URLS'] = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+
+session_options = {}
+if app.config['DATABASE_REPLICA_URLS']:
+    session_options = {'class_': RoutingSession, 'replicas': ReplicaPool(app.config['DATABASE_REPLICA_URLS'])}
+
+database = SQLAlchemy(app, session_options=session_options)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 mail = Mail(app)
@@ -53,27 +70,7 @@ login_manager.login_message_category = 'info'
 
 from app import models
 
-
-# engine = sqlalchemy.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-# inspector = sqlalchemy.inspect(engine)
-# if not inspector.has_table("usuario"):
-#     with app.app_context():
-#         #database.drop_all()
-#         database.create_all()
-#         print("Base de dados criada")
-# else:
-#     print("Base de dados já existente")
-# # Cria tabelas se ainda não existirem; sem "drop_all"
-
-
-with app.app_context():
-    inspector = sqlalchemy.inspect(database.engine)
-    if "usuario" not in inspector.get_table_names():
-        database.create_all()
-        print("Base de dados criada")
-    else:
-        print("Base de dados já existente")
-
 from .filters import register_template_filters
 register_template_filters(app)
 from app.routes import *
+from app import commands
@@ -0,0 +1,205 @@
+import re
+import subprocess
+import sys
+import time
+
+import click
+import sqlalchemy
+from flask.cli import AppGroup
+
+from app import app, database, migrations
+from app.models import Estudo, Questao, Usuario
+
+db_cli = AppGroup('db', help='Migrações e verificações do esquema.')
+app.cli.add_command(db_cli)
+
+
+@db_cli.command('upgrade')
+@click.option('--alvo', type=int, default=None, help='Para na versão informada.')
+def db_upgrade(alvo):
+    """Aplica as migrações pendentes."""
+    aplicadas = migrations.upgrade(database.engine, alvo=alvo, log=click.echo)
+    click.echo(f"Esquema na versão {migrations.versao_atual(database.engine):04d} "
+               f"({aplicadas} migração(ões) aplicada(s)).")
+
+
+@db_cli.command('current')
+def db_current():
+    """Mostra a versão atual do esquema."""
+    click.echo(f"{migrations.versao_atual(database.engine):04d}")
+
+
+def _consultas_quentes():
+    """Consultas do painel e da correção que devem usar índice."""
+    return {
+        'painel (listagem)': sqlalchemy.select(Estudo.id)
+            .where(Estudo.user_id == 1)
+            .order_by(Estudo.data_criacao.desc(), Estudo.id.desc()).limit(21),
+        'painel (estatísticas)': sqlalchemy.select(Estudo.status, Estudo.respondido, sqlalchemy.func.count())
+            .where(Estudo.user_id == 1)
+            .group_by(Estudo.status, Estudo.respondido),
+        'correção (questões)': sqlalchemy.select(Questao.id).where(Questao.estudo_id == 1),
+        'correção (agregados)': sqlalchemy.select(sqlalchemy.func.count(Questao.id))
+            .where(Questao.estudo_id == 1, Questao.correta == True),
+    }
+
+
+# Tabela lida inteira: 'SCAN tabela' sem índice (SQLite) ou 'Seq Scan' (Postgres)
+_VARREDURA_COMPLETA = re.compile(r'\bSCAN \w+(?! USING (?:COVERING )?INDEX)\b|\bSeq Scan\b')
+
+
+@db_cli.command('verificar-indices')
+def db_verificar_indices():
+    """
+    Confere pelo plano de execução se as consultas quentes usam índice e
+    nenhuma lê uma tabela inteira; sai com código 1 se alguma falhar (roda na CI).
+    """
+    engine = database.engine
+    sqlite = engine.dialect.name == 'sqlite'
+    falhas = 0
+
+    with engine.connect() as conn:
+        if not sqlite:
+            # Em tabelas pequenas o Postgres prefere seq scan; força a avaliação do índice.
+            conn.execute(sqlalchemy.text("SET enable_seqscan = off"))
+        for nome, stmt in _consultas_quentes().items():
+            sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            prefixo = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+            plano = " ".join(str(linha[-1]) for linha in conn.execute(sqlalchemy.text(prefixo + sql)))
+            usa_indice = 'ix_' in plano and not _VARREDURA_COMPLETA.search(plano)
+            falhas += not usa_indice
+            click.echo(f"[{'OK' if usa_indice else 'FALHA'}] {nome}: {plano}")
+
+    if falhas:
+        sys.exit(1)
+
+
+@app.cli.command('backfill-agregados')
+@click.option('--lote', default=500, show_default=True, help='Estudos processados por commit.')
+def backfill_agregados(lote):
+    """Recalcula os agregados de correção e o total de questões de todos os estudos existentes."""
+    ultimo_id = 0
+    total = 0
+    while True:
+        estudos = Estudo.query.filter(Estudo.id > ultimo_id) \
+            .order_by(Estudo.id).limit(lote).all()
+        if not estudos:
+            break
+        for estudo in estudos:
+            estudo.atualizar_agregados()
+        database.session.commit()
+        ultimo_id = estudos[-1].id
+        total += len(estudos)
+
+    click.echo(f"Agregados recalculados para {total} estudos.")
+
+
+@app.cli.command('migrar-fotos')
+def migrar_fotos():
+    """Move as fotos base64 legadas de 'usuario.foto_perfil' para o storage."""
+    import base64
+    from app.services.foto_perfil import salvar_foto_perfil, remover_versao_foto
+
+    migradas = 0
+    falhas = 0
+    ids = [i for (i,) in database.session.query(Usuario.id).filter(Usuario.foto_perfil != None)]
+    for usuario_id in ids:
+        usuario = database.session.get(Usuario, usuario_id)
+        try:
+            anterior = salvar_foto_perfil(usuario, base64.b64decode(usuario.foto_perfil))
+            database.session.commit()
+            remover_versao_foto(usuario_id, anterior)
+            migradas += 1
+        except ValueError as e:
+            database.session.rollback()
+            falhas += 1
+            click.echo(f"Usuário {usuario_id}: {e}")
+
+    click.echo(f"{migradas} foto(s) migrada(s), {falhas} falha(s).")
+
+
+def _reconciliar_metricas():
+    from app.services.metricas import reconciliar_metricas
+
+    with database.engine.begin() as conn:
+        desvios = reconciliar_metricas(conn)
+
+    for chave, (antes, depois) in sorted(desvios.items()):
+        click.echo(f"{chave}: {antes} -> {depois}")
+    click.echo(f"Métricas reconciliadas ({len(desvios)} desvio(s) corrigido(s)).")
+
+
+@app.cli.command('reconciliar-metricas')
+def reconciliar_metricas_cmd():
+    """Recalcula as métricas do admin a partir das tabelas."""
+    _reconciliar_metricas()
+
+
+@app.cli.command('limpar-checkpoints')
+@click.option('--dias', default=7, show_default=True, help='Idade mínima dos checkpoints removidos.')
+def limpar_checkpoints_cmd(dias):
+    """Remove checkpoints do pipeline de IA de estudos que não foram retomados."""
+    from app.services.checkpoints import limpar_checkpoints_antigos
+
+    click.echo(f"{limpar_checkpoints_antigos(dias)} checkpoint(s) removido(s).")
+
+
+@app.cli.command('agendador')
+@click.option('--intervalo', default=3600, show_default=True, help='Segundos entre as execuções.')
+@click.option('--dias-checkpoints', default=7, show_default=True, help='Idade mínima dos checkpoints removidos.')
+def agendador(intervalo, dias_checkpoints):
+    """
+    Processo de manutenção (clock do Procfile): reconcilia as métricas e
+    remove checkpoints abandonados a cada --intervalo segundos. Uma falha
+    é registrada e a execução seguinte tenta de novo.
+    """
+    from app.services.checkpoints import limpar_checkpoints_antigos
+
+    while True:
+        try:
+            _reconciliar_metricas()
+            click.echo(f"{limpar_checkpoints_antigos(dias_checkpoints)} checkpoint(s) removido(s).")
+        except Exception as e:
+            database.session.rollback()
+            click.echo(f"[agendador] falha: {e}", err=True)
+        finally:
+            database.session.remove()
+        time.sleep(intervalo)
+
+
+# Pacotes do worker de IA que o processo web não deve carregar no boot
+IMPORTS_PROIBIDOS_WEB = (
+    'langchain', 'langchain_core', 'langchain_community', 'langchain_text_splitters', 'langsmith',
+    'unstructured', 'pypdf', 'pika', 'boto3', 'botocore', 'numpy', 'httpx', 'tenacity',
+)
+
+
+@app.cli.command('verificar-imports')
+@click.option('--max-ms', type=int, default=None,
+              help='Também falha se "import app" passar deste tempo (ms). Sem ele o tempo é só informado.')
+def verificar_imports(max_ms):
+    """
+    Importa o app num processo novo (python -X importtime) e falha se algum
+    pacote de IMPORTS_PROIBIDOS_WEB foi carregado no boot. O tempo total
+    varia com a máquina, então só é limite quando --max-ms é passado.
+    """
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        capture_output=True, text=True, check=True
+    ).stderr
+
+    modulos = {}
+    for linha in saida.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)', linha)
+        if match:
+            modulos[match.group(3)] = int(match.group(1))
+
+    total_ms = modulos.get('app', 0) / 1000
+    proibidos = sorted(m for m in modulos if m.split('.')[0] in IMPORTS_PROIBIDOS_WEB and '.' not in m)
+    limite = f" (máximo {max_ms} ms)" if max_ms is not None else ""
+    click.echo(f"import app: {total_ms:.0f} ms{limite}, {len(modulos)} módulos")
+    for modulo in proibidos:
+        click.echo(f"[FALHA] {modulo} carregado no boot ({modulos[modulo] / 1000:.0f} ms)")
+
+    if proibidos or (max_ms is not None and total_ms > max_ms):
+        sys.exit(1)
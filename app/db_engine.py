@@ -0,0 +1,182 @@
+"""
+Perfil do engine SQLAlchemy por tipo de banco.
+
+SQLite: o web e o worker de IA compartilham o mesmo arquivo (docker-compose),
+então cada conexão liga WAL (leitores não bloqueiam o escritor), espera o
+lock em vez de falhar ('database is locked') e usa mmap/cache maiores.
+Postgres: pool dimensionado e pool_pre_ping para descartar conexões mortas.
+
+Opcionalmente (DATABASE_REPLICA_URLS), RoutingSession distribui as leituras
+entre réplicas e mantém as escritas no primário.
+"""
+import logging
+import os
+import threading
+import time
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(chave, default):
+    return int(os.getenv(chave, default))
+
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+    'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    # Negativo = tamanho em KiB (64 MiB por conexão)
+    'cache_size': _env_int('SQLITE_CACHE_SIZE', -64000),
+}
+
+
+def opcoes_engine(uri: str) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS adequadas ao banco da URI."""
+    if uri.startswith('sqlite'):
+        return {
+            # Timeout do driver (segundos) alinhado ao busy_timeout
+            'connect_args': {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000},
+        }
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _aplicar_pragmas_sqlite(dbapi_connection, connection_record):
+    if type(dbapi_connection).__module__.split('.')[0] not in ('sqlite3', 'pysqlite2'):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, valor in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+    finally:
+        cursor.close()
+
+
+class ReplicaPool:
+    """
+    Réplicas de leitura em round-robin. Uma réplica que falha no ping sai de
+    rotação por 'quarentena' segundos; sem réplicas saudáveis, usa-se o primário.
+    """
+
+    def __init__(self, urls, intervalo_ping: float = 30.0, quarentena: float = 30.0):
+        self.engines = [create_engine(url, **opcoes_engine(url)) for url in urls]
+        self.intervalo_ping = intervalo_ping
+        self.quarentena = quarentena
+        self._proximo = 0
+        self._verificado_em = [0.0] * len(self.engines)
+        self._fora_ate = [0.0] * len(self.engines)
+        self._lock = threading.Lock()
+
+        for engine in self.engines:
+            event.listen(engine, 'handle_error', self._ao_erro)
+
+    def _ao_erro(self, contexto):
+        # Conexão perdida no meio de uma consulta também tira a réplica de rotação
+        if contexto.is_disconnect:
+            self.marcar_falha(contexto.engine)
+
+    def _saudavel(self, indice: int, agora: float) -> bool:
+        if self._fora_ate[indice] > agora:
+            return False
+        if agora - self._verificado_em[indice] < self.intervalo_ping:
+            return True
+        try:
+            with self.engines[indice].connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except DBAPIError:
+            self.marcar_falha(self.engines[indice])
+            return False
+        self._verificado_em[indice] = agora
+        return True
+
+    def escolher(self):
+        """Próxima réplica saudável, ou None."""
+        agora = time.monotonic()
+        with self._lock:
+            inicio = self._proximo
+            self._proximo = (self._proximo + 1) % len(self.engines)
+        for deslocamento in range(len(self.engines)):
+            indice = (inicio + deslocamento) % len(self.engines)
+            if self._saudavel(indice, agora):
+                return self.engines[indice]
+        return None
+
+    def marcar_falha(self, engine):
+        indice = self.engines.index(engine)
+        self._fora_ate[indice] = time.monotonic() + self.quarentena
+        self._verificado_em[indice] = 0.0
+
+
+class RoutingSession(Session):
+    """
+    Sessão que envia SELECTs às réplicas e todo o resto ao primário. A
+    primeira instrução que não é um SELECT simples (flush do ORM, INSERT/
+    UPDATE/DELETE via session.execute, session.connection(), SELECT ... FOR
+    UPDATE) prende a sessão ao primário até ela ser fechada — ao fim da
+    requisição —, garantindo leitura da própria escrita.
+    """
+
+    def __init__(self, db, replicas: ReplicaPool | None = None, **kwargs):
+        super().__init__(db, **kwargs)
+        self._replicas = replicas
+        self._somente_primario = False
+
+    def usar_primario(self):
+        """Força o primário no restante da sessão (leituras que não toleram atraso)."""
+        self._somente_primario = True
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primario = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (
+            bind is not None
+            or self._replicas is None
+            or self._somente_primario
+            or primario is not self._db.engines.get(None)
+        ):
+            return primario
+        if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+            # Sem cláusula (session.connection(), flush) também conta como escrita
+            self._somente_primario = True
+            return primario
+        return self._replicas.escolher() or primario
+
+    def close(self):
+        super().close()
+        self._somente_primario = False
+
+
+def apos_transacao(sessao, funcao):
+    """
+    Executa funcao() quando a transação atual da sessão terminar (commit,
+    rollback ou close), ou já, se não houver uma. Para escritas que não
+    devem entrar na unidade de trabalho do chamador: no SQLite, outra conexão
+    escrevendo durante a transação dele esperaria pelo lock até o timeout.
+    """
+    if not sessao.in_transaction():
+        funcao()
+        return
+    sessao.info.setdefault('apos_transacao', []).append(funcao)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _executar_apos_transacao(sessao, transacao):
+    if transacao.parent is not None:
+        return
+    for funcao in sessao.info.pop('apos_transacao', ()):
+        try:
+            funcao()
+        except Exception:
+            # A transação do chamador já terminou; a falha não deve chegar a ela
+            log.exception("Falha em tarefa pós-transação")
@@ -1,2 +1,30 @@
-from .deepseek import *
-from .ai_health import *
+"""
+Integrações externas, importadas sob demanda (PEP 562) como em app.services.
+"""
+import importlib
+
+_EXPORTS = {
+    'deepseek': (
+        'DeepSeekLLM', 'DeepSeekError', 'DeepSeekConfig', 'chat', 'achat', 'get_config', 'get_client',
+        'get_async_client', 'fechar_async_client', 'executar_async', 'get_cache_prompts',
+    ),
+    'ai_health': ('deepseek_healthcheck',),
+    'cache_prompts': ('CachePrompts',),
+    'storage': ('get_r2_client', 'LocalStorage', 'R2Storage', 'get_storage'),
+}
+_MODULO_DE = {nome: modulo for modulo, nomes in _EXPORTS.items() for nome in nomes}
+
+__all__ = list(_MODULO_DE)
+
+
+def __getattr__(nome):
+    modulo = _MODULO_DE.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f"{__name__}.{modulo}"), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,198 @@
+"""
+Cache de respostas do LLM por prompt.
+
+A chave é o hash de (modelo, temperatura, max_tokens, mensagens). O backend é
+um arquivo SQLite local, compartilhado pelos processos do mesmo host, com
+expiração (TTL) e descarte LRU acima de max_entradas. Requisições idênticas
+simultâneas no mesmo processo são coalescidas (single-flight): só a primeira
+vai ao DeepSeek, as demais esperam e recebem a mesma resposta.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+import xxhash
+
+__all__ = ['CachePrompts']
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS respostas (
+    chave TEXT PRIMARY KEY,
+    resposta TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    acessado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_respostas_acessado_em ON respostas (acessado_em);
+"""
+
+# A poda (TTL + LRU) roda a cada N gravações, não em todas
+_PODAR_A_CADA = 64
+
+
+class _Voo:
+    __slots__ = ('evento', 'resultado', 'erro')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class CachePrompts:
+    """Cache LRU + TTL em SQLite, com coalescência de requisições em andamento."""
+
+    def __init__(self, caminho: str, ttl: float = 7 * 24 * 3600, max_entradas: int = 20000):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._em_voo = {}
+        self._em_voo_async = weakref.WeakKeyDictionary()
+        self._gravacoes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalescidos = 0
+        self.evictions = 0
+
+    @staticmethod
+    def chave(payload: dict) -> str:
+        partes = {k: payload.get(k) for k in ('model', 'temperature', 'max_tokens', 'messages')}
+        return xxhash.xxh3_128_hexdigest(json.dumps(partes, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+
+    def _conn(self) -> sqlite3.Connection:
+        # Uma conexão por thread (sqlite3 não compartilha conexões entre threads) e por processo
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_ESQUEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def obter(self, chave: str) -> str | None:
+        agora = time.time()
+        conn = self._conn()
+        linha = conn.execute('SELECT resposta, criado_em FROM respostas WHERE chave = ?', (chave,)).fetchone()
+        if linha is None or linha[1] + self.ttl <= agora:
+            if linha is not None:
+                conn.execute('DELETE FROM respostas WHERE chave = ?', (chave,))
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute('UPDATE respostas SET acessado_em = ? WHERE chave = ?', (agora, chave))
+        with self._lock:
+            self.hits += 1
+        return linha[0]
+
+    def guardar(self, chave: str, resposta: str):
+        agora = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO respostas (chave, resposta, criado_em, acessado_em) VALUES (?, ?, ?, ?)',
+            (chave, resposta, agora, agora)
+        )
+        with self._lock:
+            self._gravacoes += 1
+            podar = self._gravacoes % _PODAR_A_CADA == 1
+        if podar:
+            self.podar()
+
+    def podar(self):
+        """Remove as entradas expiradas e, acima de max_entradas, as menos acessadas."""
+        conn = self._conn()
+        removidas = conn.execute('DELETE FROM respostas WHERE criado_em <= ?', (time.time() - self.ttl,)).rowcount
+        removidas += conn.execute(
+            'DELETE FROM respostas WHERE chave IN ('
+            ' SELECT chave FROM respostas ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)',
+            (self.max_entradas,)
+        ).rowcount
+        with self._lock:
+            self.evictions += removidas
+
+    def executar(self, chave: str, produzir):
+        """Retorna a resposta em cache ou chama produzir() uma única vez por chave em andamento."""
+        resposta = self.obter(chave)
+        if resposta is not None:
+            return resposta
+
+        with self._lock:
+            voo = self._em_voo.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_voo[chave] = _Voo()
+            else:
+                self.coalescidos += 1
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = produzir()
+            self.guardar(chave, voo.resultado)
+            return voo.resultado
+        except BaseException as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_voo[chave]
+            voo.evento.set()
+
+    async def aexecutar(self, chave: str, produzir):
+        """Versão assíncrona de executar(); produzir é uma corrotina sem argumentos."""
+        resposta = self.obter(chave)
+        if resposta is not None:
+            return resposta
+
+        loop = asyncio.get_running_loop()
+        em_voo = self._em_voo_async.setdefault(loop, {})
+        futuro = em_voo.get(chave)
+        if futuro is not None:
+            with self._lock:
+                self.coalescidos += 1
+            return await asyncio.shield(futuro)
+
+        futuro = em_voo[chave] = loop.create_future()
+        try:
+            resposta = await produzir()
+            self.guardar(chave, resposta)
+            futuro.set_result(resposta)
+            return resposta
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except BaseException as e:
+            futuro.set_exception(e)
+            futuro.exception()  # marcada como lida: quem não esperava não gera aviso
+            raise
+        finally:
+            del em_voo[chave]
+
+    def stats(self) -> dict:
+        try:
+            entradas = self._conn().execute('SELECT count(*) FROM respostas').fetchone()[0]
+        except sqlite3.Error:
+            entradas = None
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'coalesced': self.coalescidos,
+                'evictions': self.evictions,
+                'size': entradas,
+                'maxsize': self.max_entradas,
+                'ttl': self.ttl,
+            }
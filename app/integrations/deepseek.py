@@ -1,30 +1,122 @@
-import os, requests
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass
+
+import httpx
+from httpx_sse import EventSource, SSEError
 from flask import current_app
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from app.integrations.cache_prompts import CachePrompts
 
 class DeepSeekLLM:
     """
     Classe Wrapper para usar a função chat do DeepSeek em contextos como LangChain.
     """
 
-    def __init__(self, model: str = "deepseek-chat", temperature: float = 0.7):
+    def __init__(self, model: str = "deepseek-chat", temperature: float = 0.7, cache: bool | None = None,
+                 max_tokens: int | None = None, etapa: str | None = None, uso: list | None = None):
         self.model = model
         self.temperature = temperature
+        self.cache = cache
+        self.max_tokens = max_tokens
+        self.etapa = etapa
+        # Tokens de prompt/completion de cada chamada feita ao DeepSeek (não inclui hits do cache)
+        self.uso = uso if uso is not None else []
+
+    def com_perfil(self, etapa: str, model: str | None = None, temperature: float | None = None,
+                   max_tokens: int | None = None) -> "DeepSeekLLM":
+        """Cópia configurada para uma etapa do pipeline; compartilha a lista de uso."""
+        return DeepSeekLLM(
+            model=model or self.model,
+            temperature=self.temperature if temperature is None else temperature,
+            cache=self.cache,
+            max_tokens=max_tokens or self.max_tokens,
+            etapa=etapa,
+            uso=self.uso
+        )
+
+    def _registrar(self, registros: list, prompt: str):
+        for registro in registros:
+            self.uso.append({"etapa": self.etapa, "caracteres_prompt": len(prompt), **registro})
 
     def invoke(self, prompt: str) -> str:
         """
         Adapta a chamada de string única do LangChain para o formato de mensagens da API.
         """
         messages = [{"role": "user", "content": prompt}]
+        registros = []
+
+        resposta = chat(
+            messages=messages,
+            model=self.model,
+            temperature=self.temperature,
+            cache=self.cache,
+            max_tokens=self.max_tokens,
+            uso=registros
+        )
+        self._registrar(registros, prompt)
+        return resposta
+
+    def stream(self, prompt: str):
+        """Como invoke, mas gera os pedaços do texto conforme chegam da API."""
+        messages = [{"role": "user", "content": prompt}]
+        registros = []
 
-        return chat(
+        yield from chat(
             messages=messages,
             model=self.model,
-            temperature=self.temperature
+            temperature=self.temperature,
+            cache=self.cache,
+            max_tokens=self.max_tokens,
+            uso=registros,
+            stream=True
         )
+        self._registrar(registros, prompt)
 
     def __call__(self, prompt: str) -> str:
         return self.invoke(prompt)
 
+    async def ainvoke(self, prompt: str, timeout: int | None = None) -> str:
+        """Versão assíncrona de invoke."""
+        messages = [{"role": "user", "content": prompt}]
+        registros = []
+
+        resposta = await achat(
+            messages=messages,
+            model=self.model,
+            temperature=self.temperature,
+            timeout=timeout,
+            cache=self.cache,
+            max_tokens=self.max_tokens,
+            uso=registros
+        )
+        self._registrar(registros, prompt)
+        return resposta
+
+    async def abatch(self, prompts: list, max_concurrency: int | None = None, timeout: int | None = None,
+                     return_exceptions: bool = False) -> list:
+        """
+        Executa vários prompts em paralelo (no máximo max_concurrency, ou
+        AI_MAX_CONCURRENCY, ao mesmo tempo), preservando a ordem.
+        """
+        semaforo = asyncio.Semaphore(max_concurrency or get_config().max_concurrency)
+
+        async def limitado(prompt):
+            async with semaforo:
+                return await self.ainvoke(prompt, timeout=timeout)
+
+        return await asyncio.gather(*(limitado(p) for p in prompts), return_exceptions=return_exceptions)
+
+    def batch(self, prompts: list, max_concurrency: int | None = None, timeout: int | None = None) -> list:
+        """abatch() para código síncrono: roda num event loop próprio, fechado ao terminar."""
+        return executar_async(self.abatch(prompts, max_concurrency=max_concurrency, timeout=timeout))
+
 class DeepSeekError(Exception):
     """Erro sanitizado para consumo pelo app."""
     def __init__(self, public_msg: str, http_status: int | None = None, detail: str | None = None):
@@ -36,44 +128,389 @@ class DeepSeekError(Exception):
 def _cfg(key, default=None):
     return (current_app.config.get(key) if current_app else None) or os.getenv(key, default)
 
-def chat(messages: list, model: str = "deepseek-chat", temperature: float = 0.7, timeout: int | None = None) -> str:
-    api_key  = _cfg('DEEPSEEK_API_KEY')
-    endpoint = _cfg('DEEPSEEK_ENDPOINT', 'https://api.deepseek.com/v1/chat/completions')
-    if not api_key:
-        raise DeepSeekError("Serviço de IA não configurado.", detail="DEEPSEEK_API_KEY ausente")
 
-    # timeouts e limites configuráveis
-    req_timeout = timeout or int(_cfg('AI_TIMEOUT_SECONDS', 90))
-    max_tokens  = int(_cfg('AI_MAX_TOKENS', 1200))
+@dataclass(frozen=True)
+class DeepSeekConfig:
+    api_key: str | None
+    endpoint: str
+    timeout: int
+    max_tokens: int
+    pool_size: int
+    max_retries: int
+    retry_max_wait: float
+    max_concurrency: int
+    prompt_cache: bool
+    prompt_cache_path: str
+    prompt_cache_ttl: float
+    prompt_cache_max_entries: int
+
+
+def _caminho_cache_prompts() -> str:
+    raiz = current_app.instance_path if current_app else tempfile.gettempdir()
+    return os.path.join(raiz, 'cache_prompts.sqlite3')
+
+
+def _ler_config() -> DeepSeekConfig:
+    return DeepSeekConfig(
+        api_key=_cfg('DEEPSEEK_API_KEY'),
+        endpoint=_cfg('DEEPSEEK_ENDPOINT', 'https://api.deepseek.com/v1/chat/completions'),
+        timeout=int(_cfg('AI_TIMEOUT_SECONDS', 90)),
+        max_tokens=int(_cfg('AI_MAX_TOKENS', 1200)),
+        pool_size=int(_cfg('AI_HTTP_POOL_SIZE', 10)),
+        max_retries=int(_cfg('AI_MAX_RETRIES', 3)),
+        retry_max_wait=float(_cfg('AI_RETRY_MAX_WAIT', 30)),
+        max_concurrency=int(_cfg('AI_MAX_CONCURRENCY', 8)),
+        prompt_cache=str(_cfg('AI_PROMPT_CACHE', 'True')) == 'True',
+        prompt_cache_path=_cfg('AI_PROMPT_CACHE_PATH') or _caminho_cache_prompts(),
+        prompt_cache_ttl=float(_cfg('AI_PROMPT_CACHE_TTL', 7 * 24 * 3600)),
+        prompt_cache_max_entries=int(_cfg('AI_PROMPT_CACHE_MAX_ENTRIES', 20000)),
+    )
+
+
+_lock = threading.Lock()
+_config: DeepSeekConfig | None = None
+_client: httpx.Client | None = None
+_client_pid: int | None = None
+_cache_prompts: CachePrompts | None = None
+
+
+def get_config() -> DeepSeekConfig:
+    """Configuração lida uma única vez por processo."""
+    global _config
+    if _config is None:
+        with _lock:
+            if _config is None:
+                _config = _ler_config()
+    return _config
+
+
+def _http2_disponivel() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_client() -> httpx.Client:
+    """
+    Cliente HTTP do processo, com pool de conexões keep-alive (HTTP/2 se o
+    pacote 'h2' estiver instalado). É thread-safe; recriado após fork.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        # Fora do _lock: get_config() também o adquire (não é reentrante)
+        cfg = get_config()
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = httpx.Client(
+                    http2=_http2_disponivel(),
+                    limits=httpx.Limits(
+                        max_connections=cfg.pool_size,
+                        max_keepalive_connections=cfg.pool_size,
+                        keepalive_expiry=60,
+                    ),
+                    timeout=httpx.Timeout(cfg.timeout, connect=10),
+                )
+                _client_pid = os.getpid()
+    return _client
+
+
+def get_cache_prompts() -> CachePrompts:
+    """Cache de respostas por prompt do processo."""
+    global _cache_prompts
+    if _cache_prompts is None:
+        cfg = get_config()
+        with _lock:
+            if _cache_prompts is None:
+                _cache_prompts = CachePrompts(cfg.prompt_cache_path, cfg.prompt_cache_ttl, cfg.prompt_cache_max_entries)
+    return _cache_prompts
+
+
+def _usar_cache(temperature: float, cache: bool | None) -> bool:
+    """Só respostas determinísticas (temperatura 0) entram no cache, salvo opt-in explícito."""
+    if cache is False or not get_config().prompt_cache:
+        return False
+    return cache is True or temperature == 0
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Cliente assíncrono com pool keep-alive, um por event loop. Quem cria o
+    loop fecha o cliente com fechar_async_client() antes de encerrá-lo
+    (executar_async já faz isso).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        cfg = get_config()
+        client = httpx.AsyncClient(
+            http2=_http2_disponivel(),
+            limits=httpx.Limits(
+                max_connections=cfg.pool_size,
+                max_keepalive_connections=cfg.pool_size,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(cfg.timeout, connect=10),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def fechar_async_client():
+    """Fecha o cliente assíncrono do event loop atual, se houver."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def executar_async(corrotina):
+    """asyncio.run(corrotina), fechando o cliente assíncrono do loop ao final."""
+    async def rodar():
+        try:
+            return await corrotina
+        finally:
+            await fechar_async_client()
+
+    return asyncio.run(rodar())
 
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+class _RespostaTransitoria(Exception):
+    """429/5xx ou falha de rede: a chamada pode ser repetida."""
+    def __init__(self, resp: httpx.Response | None = None, erro: Exception | None = None):
+        super().__init__(str(erro) if erro else f"HTTP {resp.status_code}")
+        self.resp = resp
+        self.erro = erro
+
+
+def _com_retry(funcao):
+    """
+    Repete funcao (síncrona ou corrotina) enquanto ela levantar
+    _RespostaTransitoria, até AI_MAX_RETRIES vezes; política única de chat,
+    _chat_stream e achat.
+    """
+    return retry(
+        retry=retry_if_exception_type(_RespostaTransitoria),
+        stop=stop_after_attempt(get_config().max_retries + 1),
+        wait=_espera_retry,
+        reraise=True,
+    )(funcao)
+
+
+def _verificar_transitoria(resp: httpx.Response) -> httpx.Response:
+    if _e_transitorio(resp.status_code):
+        raise _RespostaTransitoria(resp=resp)
+    return resp
+
+
+def _ultima_resposta(e: _RespostaTransitoria) -> httpx.Response:
+    """Tentativas esgotadas: a última resposta HTTP ou, se nenhuma chegou, DeepSeekError."""
+    if e.resp is None:
+        raise DeepSeekError("Falha de conexão com o serviço de IA. Tente novamente mais tarde.",
+                            detail=str(e.erro) or type(e.erro).__name__)
+    return e.resp
+
+
+def _espera_retry(retry_state) -> float:
+    """Respeita Retry-After quando enviado; senão, backoff exponencial com jitter."""
+    cfg = get_config()
+    exc = retry_state.outcome.exception()
+    retry_after = exc.resp.headers.get('Retry-After') if getattr(exc, 'resp', None) is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), cfg.retry_max_wait) * random.uniform(1.0, 1.1)
+        except ValueError:
+            pass
+    return wait_random_exponential(multiplier=0.5, max=cfg.retry_max_wait)(retry_state)
+
+
+def _montar_requisicao(messages: list, model: str, temperature: float, max_tokens: int | None = None) -> tuple:
+    cfg = get_config()
+    if not cfg.api_key:
+        raise DeepSeekError("Serviço de IA não configurado.", detail="DEEPSEEK_API_KEY ausente")
+
+    headers = {"Authorization": f"Bearer {cfg.api_key}", "Content-Type": "application/json"}
     payload = {
         "model": model,
         "messages": messages,
         "temperature": temperature,
-        "max_tokens": max_tokens
+        "max_tokens": max_tokens or cfg.max_tokens
     }
+    return headers, payload
 
-    try:
-        resp = requests.post(endpoint, json=payload, headers=headers, timeout=(10, req_timeout))
-    except requests.RequestException as e:
-        raise DeepSeekError("Falha de conexão com o serviço de IA. Tente novamente mais tarde.", detail=str(e))
 
+def _erro_http(resp: httpx.Response) -> DeepSeekError:
     if resp.status_code == 401:
-        raise DeepSeekError("Serviço de IA indisponível no momento.", http_status=401, detail="401 Unauthorized")
+        return DeepSeekError("Serviço de IA indisponível no momento.", http_status=401, detail="401 Unauthorized")
     if resp.status_code == 402:
-        raise DeepSeekError("Serviço de IA temporariamente indisponível.", http_status=402, detail="402 Payment Required")
+        return DeepSeekError("Serviço de IA temporariamente indisponível.", http_status=402, detail="402 Payment Required")
     if resp.status_code == 403:
-        raise DeepSeekError("Serviço de IA indisponível no momento.", http_status=403, detail="403 Forbidden")
-    if resp.status_code >= 400:
-        try:
-            info = resp.json()
-        except Exception:
-            info = resp.text
-        raise DeepSeekError("Serviço de IA indisponível no momento.", http_status=resp.status_code, detail=str(info))
+        return DeepSeekError("Serviço de IA indisponível no momento.", http_status=403, detail="403 Forbidden")
+    try:
+        info = resp.json()
+    except Exception:
+        info = resp.text
+    return DeepSeekError("Serviço de IA indisponível no momento.", http_status=resp.status_code, detail=str(info))
+
 
+def _uso(data: dict) -> dict:
+    usage = data.get("usage") or {}
+    return {
+        "model": data.get("model"),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "prompt_cache_hit_tokens": usage.get("prompt_cache_hit_tokens"),
+    }
+
+
+def _conteudo(resp: httpx.Response, uso: list | None = None) -> str:
+    if resp.status_code >= 400:
+        raise _erro_http(resp)
     try:
         data = resp.json()
-        return data["choices"][0]["message"]["content"]
+        conteudo = data["choices"][0]["message"]["content"]
     except Exception as e:
-        raise DeepSeekError("Resposta inválida do serviço de IA.", detail=str(e))
\ No newline at end of file
+        raise DeepSeekError("Resposta inválida do serviço de IA.", detail=str(e))
+    if uso is not None:
+        uso.append(_uso(data))
+    return conteudo
+
+
+def _e_transitorio(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def chat(messages: list, model: str = "deepseek-chat", temperature: float = 0.7, timeout: int | None = None,
+         cache: bool | None = None, stream: bool = False, max_tokens: int | None = None, uso: list | None = None):
+    """
+    Envia as mensagens ao DeepSeek e retorna o conteúdo da resposta. Com
+    temperatura 0 (ou cache=True) a resposta vem do cache de prompts quando
+    possível; cache=False força a chamada. Com stream=True retorna um
+    iterador dos pedaços de texto, recebidos via SSE. max_tokens sobrepõe
+    AI_MAX_TOKENS; se uso for uma lista, recebe os tokens de cada chamada feita.
+    """
+    if stream:
+        return _chat_stream(messages, model, temperature, timeout, cache, max_tokens, uso)
+
+    cfg = get_config()
+    headers, payload = _montar_requisicao(messages, model, temperature, max_tokens)
+    req_timeout = httpx.Timeout(timeout or cfg.timeout, connect=10)
+
+    @_com_retry
+    def enviar() -> httpx.Response:
+        try:
+            resp = get_client().post(cfg.endpoint, json=payload, headers=headers, timeout=req_timeout)
+        except httpx.TransportError as e:
+            raise _RespostaTransitoria(erro=e)
+        return _verificar_transitoria(resp)
+
+    def chamar() -> str:
+        try:
+            resp = enviar()
+        except _RespostaTransitoria as e:
+            resp = _ultima_resposta(e)
+        return _conteudo(resp, uso)
+
+    if _usar_cache(temperature, cache):
+        return get_cache_prompts().executar(CachePrompts.chave(payload), chamar)
+    return chamar()
+
+
+def _chat_stream(messages: list, model: str, temperature: float, timeout: int | None, cache: bool | None,
+                 max_tokens: int | None = None, uso: list | None = None):
+    """
+    Gera os deltas de conteúdo conforme chegam. O retry cobre só a abertura
+    da conexão: depois que o primeiro pedaço foi entregue não dá para repetir
+    de forma transparente, então falhas no meio viram DeepSeekError.
+    """
+    cfg = get_config()
+    headers, payload = _montar_requisicao(messages, model, temperature, max_tokens)
+    usar_cache = _usar_cache(temperature, cache)
+    if usar_cache:
+        chave = CachePrompts.chave(payload)
+        em_cache = get_cache_prompts().obter(chave)
+        if em_cache is not None:
+            yield em_cache
+            return
+
+    headers = {**headers, "Accept": "text/event-stream"}
+    payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+    req_timeout = httpx.Timeout(timeout or cfg.timeout, connect=10)
+
+    @_com_retry
+    def abrir() -> httpx.Response:
+        client = get_client()
+        requisicao = client.build_request("POST", cfg.endpoint, json=payload, headers=headers, timeout=req_timeout)
+        try:
+            resp = client.send(requisicao, stream=True)
+        except httpx.TransportError as e:
+            raise _RespostaTransitoria(erro=e)
+        if _e_transitorio(resp.status_code):
+            resp.read()
+            resp.close()
+            raise _RespostaTransitoria(resp=resp)
+        return resp
+
+    try:
+        resp = abrir()
+    except _RespostaTransitoria as e:
+        raise _erro_http(_ultima_resposta(e))
+
+    pedacos = []
+    try:
+        if resp.status_code >= 400:
+            resp.read()
+            raise _erro_http(resp)
+        for evento in EventSource(resp).iter_sse():
+            if evento.data == "[DONE]":
+                break
+            dados = json.loads(evento.data)
+            if dados.get("usage") and uso is not None:
+                uso.append(_uso(dados))
+            if not dados.get("choices"):
+                continue
+            delta = dados["choices"][0]["delta"].get("content")
+            if delta:
+                pedacos.append(delta)
+                yield delta
+    except (httpx.TransportError, SSEError, ValueError, KeyError, IndexError) as e:
+        raise DeepSeekError("Resposta interrompida do serviço de IA.", detail=str(e) or type(e).__name__)
+    finally:
+        resp.close()
+
+    if usar_cache and pedacos:
+        get_cache_prompts().guardar(chave, "".join(pedacos))
+
+
+async def achat(messages: list, model: str = "deepseek-chat", temperature: float = 0.7, timeout: int | None = None,
+                cache: bool | None = None, max_tokens: int | None = None, uso: list | None = None) -> str:
+    """Versão assíncrona de chat(), com o mesmo retry, cache e os mesmos DeepSeekError."""
+    cfg = get_config()
+    headers, payload = _montar_requisicao(messages, model, temperature, max_tokens)
+    req_timeout = httpx.Timeout(timeout or cfg.timeout, connect=10)
+
+    @_com_retry
+    async def enviar() -> httpx.Response:
+        try:
+            # wait_for limita a duração total da tentativa, não só cada leitura
+            resp = await asyncio.wait_for(
+                get_async_client().post(cfg.endpoint, json=payload, headers=headers, timeout=req_timeout),
+                timeout=timeout or cfg.timeout
+            )
+        except (httpx.TransportError, asyncio.TimeoutError) as e:
+            raise _RespostaTransitoria(erro=e)
+        return _verificar_transitoria(resp)
+
+    async def chamar() -> str:
+        try:
+            resp = await enviar()
+        except _RespostaTransitoria as e:
+            resp = _ultima_resposta(e)
+        return _conteudo(resp, uso)
+
+    if _usar_cache(temperature, cache):
+        return await get_cache_prompts().aexecutar(CachePrompts.chave(payload), chamar)
+    return await chamar()
@@ -0,0 +1,96 @@
+import os
+
+from flask import current_app
+
+
+def get_r2_client():
+    # boto3 só é carregado quando o R2 é usado (o processo web não precisa dele no boot)
+    import boto3
+
+    return boto3.client(
+        's3',
+        endpoint_url=f"https://{os.getenv('R2_ACCOUNT_ID')}.r2.cloudflarestorage.com",
+        aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY')
+    )
+
+
+class LocalStorage:
+    """Armazena objetos binários em disco, sob um diretório raiz."""
+
+    def __init__(self, raiz: str):
+        self.raiz = raiz
+
+    def _caminho(self, chave: str) -> str:
+        caminho = os.path.normpath(os.path.join(self.raiz, chave))
+        if not caminho.startswith(os.path.normpath(self.raiz) + os.sep):
+            raise ValueError(f"Chave inválida: {chave}")
+        return caminho
+
+    def salvar(self, chave: str, dados: bytes, content_type: str):
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+
+    def ler(self, chave: str) -> bytes | None:
+        try:
+            with open(self._caminho(chave), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def remover(self, chave: str):
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+
+
+class R2Storage:
+    """Armazena objetos binários num bucket do Cloudflare R2 (API S3)."""
+
+    def __init__(self, bucket: str, prefixo: str = ''):
+        self.bucket = bucket
+        self.prefixo = prefixo
+        self.client = get_r2_client()
+
+    def salvar(self, chave: str, dados: bytes, content_type: str):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefixo + chave, Body=dados, ContentType=content_type)
+
+    def ler(self, chave: str) -> bytes | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self.prefixo + chave)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return obj['Body'].read()
+
+    def remover(self, chave: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefixo + chave)
+
+
+_storages = {}
+
+
+def get_storage(nome: str = 'FOTOS'):
+    """
+    Retorna (e memoriza) o backend configurado em '<nome>_STORAGE':
+    'local' (padrão, em '<nome>_STORAGE_DIR') ou 'r2' (bucket R2_BUCKET_NAME).
+    """
+    if nome not in _storages:
+        config = current_app.config
+        tipo = config.get(f'{nome}_STORAGE', 'local')
+        if tipo == 'r2':
+            _storages[nome] = R2Storage(os.getenv('R2_BUCKET_NAME'), prefixo=f"{nome.lower()}/")
+        elif tipo == 'local':
+            raiz = config.get(f'{nome}_STORAGE_DIR') or os.path.join(current_app.instance_path, nome.lower())
+            _storages[nome] = LocalStorage(raiz)
+        else:
+            raise ValueError(f"Storage desconhecido para {nome}: {tipo}")
+    return _storages[nome]
@@ -0,0 +1,58 @@
+"""
+Migrações versionadas do esquema.
+
+Cada módulo 'mNNNN_descricao.py' expõe upgrade(conn) e é aplicado uma única
+vez, em ordem, pelo comando 'flask db upgrade'. A versão aplicada fica na
+tabela 'schema_versao'. Como a 0001 cria as tabelas a partir dos modelos
+atuais, as migrações seguintes devem ser idempotentes.
+"""
+import importlib
+import pkgutil
+import re
+
+import sqlalchemy
+
+from app.models import now_brazil
+
+_PADRAO_MODULO = re.compile(r'^m(\d{4})_(\w+)$')
+
+schema_versao = sqlalchemy.Table(
+    'schema_versao', sqlalchemy.MetaData(),
+    sqlalchemy.Column('versao', sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column('nome', sqlalchemy.String(100), nullable=False),
+    sqlalchemy.Column('aplicada_em', sqlalchemy.DateTime, nullable=False),
+)
+
+
+def listar_migracoes():
+    """Retorna [(versao, nome, modulo)] ordenado por versão."""
+    migracoes = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _PADRAO_MODULO.match(info.name)
+        if match:
+            modulo = importlib.import_module(f"{__name__}.{info.name}")
+            migracoes.append((int(match.group(1)), match.group(2), modulo))
+    return sorted(migracoes, key=lambda m: m[0])
+
+
+def versao_atual(engine):
+    """Última versão aplicada (0 se o banco nunca foi migrado)."""
+    schema_versao.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        versao = conn.execute(sqlalchemy.select(sqlalchemy.func.max(schema_versao.c.versao))).scalar()
+    return versao or 0
+
+
+def upgrade(engine, alvo=None, log=print):
+    """Aplica, cada uma em sua transação, as migrações pendentes até 'alvo'."""
+    atual = versao_atual(engine)
+    aplicadas = 0
+    for versao, nome, modulo in listar_migracoes():
+        if versao <= atual or (alvo is not None and versao > alvo):
+            continue
+        with engine.begin() as conn:
+            modulo.upgrade(conn)
+            conn.execute(schema_versao.insert().values(versao=versao, nome=nome, aplicada_em=now_brazil()))
+        log(f"Migração {versao:04d} ({nome}) aplicada.")
+        aplicadas += 1
+    return aplicadas
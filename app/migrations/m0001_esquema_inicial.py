@@ -0,0 +1,6 @@
+"""Cria as tabelas que ainda não existem a partir dos modelos."""
+from app import database
+
+
+def upgrade(conn):
+    database.metadata.create_all(bind=conn)
@@ -0,0 +1,27 @@
+"""Adiciona os agregados de correção em 'estudos' e os preenche."""
+import sqlalchemy
+
+COLUNAS = {
+    'questoes_total': 'INTEGER NOT NULL DEFAULT 0',
+    'questoes_acertos': 'INTEGER NOT NULL DEFAULT 0',
+    'respondido': 'BOOLEAN NOT NULL DEFAULT FALSE',
+    'corrigido_em': 'TIMESTAMP',
+}
+
+BACKFILL = """
+UPDATE estudos SET
+    questoes_total = (SELECT COUNT(*) FROM questoes q WHERE q.estudo_id = estudos.id),
+    questoes_acertos = (SELECT COUNT(*) FROM questoes q WHERE q.estudo_id = estudos.id AND q.correta = :verdadeiro),
+    respondido = EXISTS (SELECT 1 FROM questoes q WHERE q.estudo_id = estudos.id AND q.resposta_usuario IS NOT NULL)
+"""
+
+
+def upgrade(conn):
+    existentes = {c['name'] for c in sqlalchemy.inspect(conn).get_columns('estudos')}
+    faltantes = [nome for nome in COLUNAS if nome not in existentes]
+    if not faltantes:
+        return
+
+    for nome in faltantes:
+        conn.execute(sqlalchemy.text(f"ALTER TABLE estudos ADD COLUMN {nome} {COLUNAS[nome]}"))
+    conn.execute(sqlalchemy.text(BACKFILL), {'verdadeiro': True})
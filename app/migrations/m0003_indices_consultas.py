@@ -0,0 +1,15 @@
+"""
+Índices das consultas quentes. Os compostos também atendem filtros só pela
+primeira coluna (estudos.user_id, questoes.estudo_id).
+"""
+import sqlalchemy
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS ix_estudos_user_id_data_criacao ON estudos (user_id, data_criacao)",
+    "CREATE INDEX IF NOT EXISTS ix_questoes_estudo_id_correta ON questoes (estudo_id, correta)",
+]
+
+
+def upgrade(conn):
+    for ddl in INDICES:
+        conn.execute(sqlalchemy.text(ddl))
@@ -0,0 +1,8 @@
+"""Adiciona 'usuario.foto_versao' (fotos de perfil fora da linha do usuário)."""
+import sqlalchemy
+
+
+def upgrade(conn):
+    existentes = {c['name'] for c in sqlalchemy.inspect(conn).get_columns('usuario')}
+    if 'foto_versao' not in existentes:
+        conn.execute(sqlalchemy.text("ALTER TABLE usuario ADD COLUMN foto_versao VARCHAR(32)"))
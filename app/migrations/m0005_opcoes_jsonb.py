@@ -0,0 +1,16 @@
+"""
+Converte 'questoes.opcoes_json' para JSONB no Postgres. No SQLite o tipo JSON
+já é armazenado como TEXT, então as linhas existentes servem como estão.
+"""
+import sqlalchemy
+
+
+def upgrade(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+
+    colunas = {c['name']: c['type'] for c in sqlalchemy.inspect(conn).get_columns('questoes')}
+    if colunas['opcoes_json'].__class__.__name__ != 'JSONB':
+        conn.execute(sqlalchemy.text(
+            "ALTER TABLE questoes ALTER COLUMN opcoes_json TYPE JSONB USING opcoes_json::jsonb"
+        ))
@@ -0,0 +1,19 @@
+"""Adiciona 'questoes.resposta_chave' e a preenche para as questões existentes."""
+import sqlalchemy
+
+from app.utils.texto import normalizar_resposta
+
+
+def upgrade(conn):
+    existentes = {c['name'] for c in sqlalchemy.inspect(conn).get_columns('questoes')}
+    if 'resposta_chave' not in existentes:
+        conn.execute(sqlalchemy.text("ALTER TABLE questoes ADD COLUMN resposta_chave VARCHAR(255)"))
+
+    linhas = conn.execute(sqlalchemy.text(
+        "SELECT id, resposta_correta FROM questoes WHERE resposta_chave IS NULL"
+    )).all()
+    if linhas:
+        conn.execute(
+            sqlalchemy.text("UPDATE questoes SET resposta_chave = :chave WHERE id = :id"),
+            [{'id': id_, 'chave': normalizar_resposta(resposta)} for id_, resposta in linhas]
+        )
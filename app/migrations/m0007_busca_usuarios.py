@@ -0,0 +1,55 @@
+"""
+Busca de usuários no admin: colunas só-dígitos de CPF/WhatsApp (busca por
+prefixo) e índice de substring para nome/e-mail — FTS5 com tokenizer
+trigram no SQLite, pg_trgm (GIN) no Postgres.
+"""
+import sqlalchemy
+
+from app.utils.texto import somente_digitos
+
+LOTE = 10000
+
+FTS_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS usuario_busca USING fts5("
+    "nome, email, content='usuario', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS usuario_busca_ai AFTER INSERT ON usuario BEGIN "
+    "INSERT INTO usuario_busca(rowid, nome, email) VALUES (new.id, new.nome, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS usuario_busca_ad AFTER DELETE ON usuario BEGIN "
+    "INSERT INTO usuario_busca(usuario_busca, rowid, nome, email) VALUES ('delete', old.id, old.nome, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS usuario_busca_au AFTER UPDATE OF nome, email ON usuario BEGIN "
+    "INSERT INTO usuario_busca(usuario_busca, rowid, nome, email) VALUES ('delete', old.id, old.nome, old.email); "
+    "INSERT INTO usuario_busca(rowid, nome, email) VALUES (new.id, new.nome, new.email); END",
+    "INSERT INTO usuario_busca(usuario_busca) VALUES ('rebuild')",
+]
+
+TRGM_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_usuario_nome_trgm ON usuario USING gin (nome gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_usuario_email_trgm ON usuario USING gin (email gin_trgm_ops)",
+]
+
+
+def upgrade(conn):
+    existentes = {c['name'] for c in sqlalchemy.inspect(conn).get_columns('usuario')}
+    for coluna, tamanho in (('cpf_digitos', 14), ('whatsapp_digitos', 15)):
+        if coluna not in existentes:
+            conn.execute(sqlalchemy.text(f"ALTER TABLE usuario ADD COLUMN {coluna} VARCHAR({tamanho})"))
+        conn.execute(sqlalchemy.text(f"CREATE INDEX IF NOT EXISTS ix_usuario_{coluna} ON usuario ({coluna})"))
+
+    ultimo_id = 0
+    while True:
+        linhas = conn.execute(sqlalchemy.text(
+            "SELECT id, cpf, whatsapp FROM usuario WHERE id > :id ORDER BY id LIMIT :lote"
+        ), {'id': ultimo_id, 'lote': LOTE}).all()
+        if not linhas:
+            break
+        conn.execute(
+            sqlalchemy.text("UPDATE usuario SET cpf_digitos = :cpf, whatsapp_digitos = :whatsapp WHERE id = :id"),
+            [{'id': id_, 'cpf': somente_digitos(cpf), 'whatsapp': somente_digitos(whatsapp)}
+             for id_, cpf, whatsapp in linhas]
+        )
+        ultimo_id = linhas[-1][0]
+
+    ddl = FTS_SQLITE if conn.dialect.name == 'sqlite' else TRGM_POSTGRES
+    for comando in ddl:
+        conn.execute(sqlalchemy.text(comando))
@@ -0,0 +1,9 @@
+"""Cria as tabelas de métricas e as preenche a partir dos dados atuais."""
+from app.models import Metrica, MetricaDiaria
+from app.services.metricas import reconciliar_metricas
+
+
+def upgrade(conn):
+    Metrica.__table__.create(conn, checkfirst=True)
+    MetricaDiaria.__table__.create(conn, checkfirst=True)
+    reconciliar_metricas(conn)
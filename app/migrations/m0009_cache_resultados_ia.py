@@ -0,0 +1,6 @@
+"""Cria a tabela do cache de resultados de IA endereçado por conteúdo."""
+from app.models import ResultadoIACache
+
+
+def upgrade(conn):
+    ResultadoIACache.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,6 @@
+"""Cria a tabela de checkpoints das etapas do pipeline de IA."""
+from app.models import CheckpointEstudo
+
+
+def upgrade(conn):
+    CheckpointEstudo.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,31 @@
+"""
+Preenche 'estudos.data_criacao' nulo (linhas legadas) com a data de cadastro
+do usuário e torna a coluna obrigatória: a paginação keyset do painel usa
+(data_criacao, id) como cursor. O SQLite não altera colunas existentes, então
+lá a restrição é feita por triggers.
+"""
+import sqlalchemy
+
+BACKFILL = """
+UPDATE estudos SET data_criacao = (
+    SELECT u.data_cadastro FROM usuario u WHERE u.id = estudos.user_id
+) WHERE data_criacao IS NULL
+"""
+
+NOT_NULL_SQLITE = [
+    "CREATE TRIGGER IF NOT EXISTS estudos_data_criacao_ai BEFORE INSERT ON estudos "
+    "WHEN new.data_criacao IS NULL BEGIN "
+    "SELECT RAISE(ABORT, 'NOT NULL constraint failed: estudos.data_criacao'); END",
+    "CREATE TRIGGER IF NOT EXISTS estudos_data_criacao_au BEFORE UPDATE OF data_criacao ON estudos "
+    "WHEN new.data_criacao IS NULL BEGIN "
+    "SELECT RAISE(ABORT, 'NOT NULL constraint failed: estudos.data_criacao'); END",
+]
+
+
+def upgrade(conn):
+    conn.execute(sqlalchemy.text(BACKFILL))
+    if conn.dialect.name == 'sqlite':
+        for comando in NOT_NULL_SQLITE:
+            conn.execute(sqlalchemy.text(comando))
+    else:
+        conn.execute(sqlalchemy.text("ALTER TABLE estudos ALTER COLUMN data_criacao SET NOT NULL"))
@@ -0,0 +1,13 @@
+"""
+Adiciona 'checkpoints_estudo.versao' e descarta os checkpoints anteriores:
+sem versão, não há como saber se foram gerados pelo pipeline atual (e a
+extração guardava o texto inteiro, agora só uma referência ao cache).
+"""
+import sqlalchemy
+
+
+def upgrade(conn):
+    existentes = {c['name'] for c in sqlalchemy.inspect(conn).get_columns('checkpoints_estudo')}
+    if 'versao' not in existentes:
+        conn.execute(sqlalchemy.text("ALTER TABLE checkpoints_estudo ADD COLUMN versao VARCHAR(100)"))
+        conn.execute(sqlalchemy.text("DELETE FROM checkpoints_estudo"))
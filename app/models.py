@@ -1,15 +1,71 @@
-from app import database, login_manager
+from app import app, database, login_manager
+from app.utils.cache import TTLCache
+from app.utils.texto import normalizar_resposta, somente_digitos
+from dataclasses import dataclass
 from datetime import datetime, date
+from flask import url_for
 from flask_login import UserMixin
 from pytz import timezone
+from sqlalchemy import event, func, case, inspect, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import set_committed_value
 
 import json
 
 
 
+@dataclass(frozen=True, eq=False)
+class UsuarioSessao(UserMixin):
+    """
+    Retrato imutável e enxuto do usuário logado, usado como current_user.
+    Para alterar dados, carregue o Usuario pelo id.
+    """
+    id: int
+    nome: str
+    email: str
+    is_admin: bool
+    is_validated: bool
+    foto_versao: str | None
+
+    @classmethod
+    def de_usuario(cls, usuario):
+        return cls(
+            id=usuario.id,
+            nome=usuario.nome,
+            email=usuario.email,
+            is_admin=bool(usuario.is_admin),
+            is_validated=bool(usuario.is_validated),
+            foto_versao=usuario.foto_versao,
+        )
+
+    def url_foto(self, tamanho='m'):
+        return Usuario.url_foto(self, tamanho)
+
+
+# Cache por processo: edições feitas em outro worker aparecem em até TTL segundos.
+identidades = TTLCache(
+    maxsize=int(app.config.get('IDENTITY_CACHE_SIZE', 1024)),
+    ttl=float(app.config.get('IDENTITY_CACHE_TTL', 30)),
+)
+
+
 @login_manager.user_loader
 def load_usuario(id_usuario):
-    return Usuario.query.get(int(id_usuario))
+    id_usuario = int(id_usuario)
+    sessao = identidades.get(id_usuario)
+    if sessao is None:
+        usuario = database.session.get(Usuario, id_usuario)
+        if usuario is None:
+            return None
+        sessao = UsuarioSessao.de_usuario(usuario)
+        identidades.set(id_usuario, sessao)
+    return sessao
+
+
+def invalidar_identidade(id_usuario):
+    """Descarta o retrato em cache após alterar ou excluir o usuário."""
+    identidades.invalidate(int(id_usuario))
 
 def now_brazil():
     """Retorna a data e hora atual no fuso horário de Brasília."""
@@ -19,7 +75,9 @@ def now_brazil():
 
 class Usuario(database.Model, UserMixin):
     id = database.Column(database.Integer, primary_key=True)
-    foto_perfil = database.Column(database.Text, nullable=True)
+    # Legado (base64). Adiado para não pesar no load_usuario; ver 'flask migrar-fotos'.
+    foto_perfil = database.deferred(database.Column(database.Text, nullable=True))
+    foto_versao = database.Column(database.String(32), nullable=True)
     nome = database.Column(database.String(100), nullable=False)
     cpf = database.Column(database.String(14), unique=True, nullable=False)
     whatsapp = database.Column(database.String(15), nullable=False)
@@ -28,6 +86,20 @@ class Usuario(database.Model, UserMixin):
     data_cadastro = database.Column(database.DateTime, default=now_brazil, nullable=False)
     is_admin = database.Column(database.Boolean, default=False)
     is_validated = database.Column(database.Boolean, default=False)
+    # Só dígitos, para busca por prefixo no admin (mantidos por _normalizar_digitos)
+    cpf_digitos = database.Column(database.String(14), index=True, nullable=True)
+    whatsapp_digitos = database.Column(database.String(15), index=True, nullable=True)
+
+    @database.validates('cpf', 'whatsapp')
+    def _normalizar_digitos(self, campo, valor):
+        setattr(self, f'{campo}_digitos', somente_digitos(valor))
+        return valor
+
+    def url_foto(self, tamanho='m'):
+        """URL versionada da foto de perfil ('p', 'm' ou 'g'), ou None."""
+        if not self.foto_versao:
+            return None
+        return url_for('foto_perfil', usuario_id=self.id, versao=self.foto_versao, tamanho=tamanho)
 
 
 
@@ -35,28 +107,43 @@ class Usuario(database.Model, UserMixin):
 
 class Estudo(database.Model):
     __tablename__ = 'estudos'
+    __table_args__ = (
+        # Painel: WHERE user_id = ? ORDER BY data_criacao DESC, id DESC
+        database.Index('ix_estudos_user_id_data_criacao', 'user_id', 'data_criacao'),
+    )
 
     id = database.Column(database.Integer, primary_key=True)
     user_id = database.Column(database.Integer, database.ForeignKey('usuario.id'), nullable=False)
     titulo = database.Column(database.String(255), nullable=False)
-    data_criacao = database.Column(database.DateTime, default=now_brazil)
+    data_criacao = database.Column(database.DateTime, default=now_brazil, nullable=False)
     resumo = database.Column(database.Text, nullable=False)
-    status = database.Column(database.String(50), default='pronto', nullable=False)
+    # active_history: o valor anterior é carregado na atribuição, para o evento de métricas
+    status = database.column_property(
+        database.Column(database.String(50), default='pronto', nullable=False), active_history=True
+    )
     caminho_arquivo = database.Column(database.String(512), nullable=True)
 
+    # Agregados da correção (total mantido a cada questão inserida/removida; ver atualizar_agregados)
+    questoes_total = database.Column(database.Integer, default=0, nullable=False)
+    questoes_acertos = database.Column(database.Integer, default=0, nullable=False)
+    respondido = database.Column(database.Boolean, default=False, nullable=False)
+    corrigido_em = database.Column(database.DateTime, nullable=True)
+
     # Relações
-    questoes = database.relationship("Questao", backref="estudo", lazy='dynamic', cascade="all, delete-orphan")
+    questoes = database.relationship("Questao", backref="estudo", lazy='dynamic', cascade="all, delete-orphan",
+                                     order_by="Questao.id")
     usuario = database.relationship("Usuario")
+    checkpoints = database.relationship("CheckpointEstudo", cascade="all, delete-orphan")
 
     @property
     def total_questoes(self):
         """Retorna o número total de questões deste estudo."""
-        return self.questoes.count()
+        return self.questoes_total or 0
 
     @property
     def qtd_acertos(self):
-        """Conta quantas questões estão marcadas como corretas."""
-        return self.questoes.filter_by(correta=True).count()
+        """Retorna quantas questões estão marcadas como corretas."""
+        return self.questoes_acertos or 0
 
     @property
     def foi_respondido(self):
@@ -64,8 +151,7 @@ class Estudo(database.Model):
         Verifica se o usuário já respondeu (baseado se há respostas salvas).
         Retorna True se houver pelo menos uma resposta salva.
         """
-        # Verifica se existe alguma questão com resposta_usuario preenchida
-        return self.questoes.filter(Questao.resposta_usuario != None).count() > 0
+        return bool(self.respondido)
 
     @property
     def aproveitamento(self):
@@ -75,27 +161,157 @@ class Estudo(database.Model):
             return 0
         return int((self.qtd_acertos / total) * 100)
 
+    def atualizar_agregados(self):
+        """
+        Recalcula total, acertos e 'respondido' a partir das questões
+        persistidas, numa única consulta agregada.
+        """
+        total, acertos, respondidas = database.session.query(
+            func.count(Questao.id),
+            func.coalesce(func.sum(case((Questao.correta == True, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Questao.resposta_usuario != None, 1), else_=0)), 0),
+        ).filter(Questao.estudo_id == self.id).one()
 
+        self.questoes_total = total
+        self.questoes_acertos = acertos
+        self.respondido = respondidas > 0
+
+    def registrar_questoes(self, questoes):
+        """
+        Insere as questões geradas pela IA (lista de dicts com 'pergunta',
+        'opcoes' e 'resposta_correta'); o total do estudo é atualizado no flush.
+        """
+        for item in questoes:
+            database.session.add(Questao(
+                estudo=self,
+                pergunta=item['pergunta'],
+                opcoes_json=list(item.get('opcoes', [])),
+                resposta_correta=item['resposta_correta'],
+                resposta_chave=normalizar_resposta(item['resposta_correta']),
+            ))
 
 
 class Questao(database.Model):
     __tablename__ = 'questoes'
+    __table_args__ = (
+        # Correção e agregados: WHERE estudo_id = ? [AND correta = ?]
+        database.Index('ix_questoes_estudo_id_correta', 'estudo_id', 'correta'),
+    )
 
     id = database.Column(database.Integer, primary_key=True)
     estudo_id = database.Column(database.Integer, database.ForeignKey('estudos.id'), nullable=False)
     pergunta = database.Column(database.Text, nullable=False)
-    # Armazena as opções como TEXT (string JSON)
-    opcoes_json = database.Column(database.Text, nullable=False)
+    # Lista de opções em JSON nativo (JSONB no Postgres, JSON1/TEXT no SQLite),
+    # desserializada uma única vez quando a linha é carregada.
+    opcoes_json = database.Column(database.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
     resposta_correta = database.Column(database.String(255), nullable=False)
+    # normalizar_resposta(resposta_correta), calculada na ingestão
+    resposta_chave = database.Column(database.String(255), nullable=True)
     resposta_usuario = database.Column(database.String(255), nullable=True)
     correta = database.Column(database.Boolean, default=False)
 
     @property
     def opcoes(self):
-        """Converte a string JSON armazenada no banco para uma lista Python."""
-        try:
-            if self.opcoes_json:
-                return json.loads(self.opcoes_json)
-            return []
-        except ValueError:
-            return []
\ No newline at end of file
+        """Lista de opções já desserializada pela coluna JSON."""
+        opcoes = self.opcoes_json
+        if isinstance(opcoes, str):
+            # Linhas legadas gravadas como string JSON dentro da coluna JSON
+            try:
+                opcoes = json.loads(opcoes)
+            except ValueError:
+                return []
+        return opcoes if isinstance(opcoes, list) else []
+
+
+def _ajustar_total_questoes(connection, questao, delta):
+    tabela = Estudo.__table__
+    connection.execute(
+        update(tabela).where(tabela.c.id == questao.estudo_id)
+        .values(questoes_total=tabela.c.questoes_total + delta)
+    )
+
+    # O UPDATE não passa pelo ORM: replica o delta no Estudo já carregado na
+    # sessão para que leituras antes do commit não vejam o total antigo.
+    sessao = object_session(questao)
+    if sessao is None:
+        return
+    chave = inspect(Estudo).identity_key_from_primary_key((questao.estudo_id,))
+    estudo = sessao.identity_map.get(chave)
+    if estudo is not None and 'questoes_total' in estudo.__dict__:
+        set_committed_value(estudo, 'questoes_total', (estudo.questoes_total or 0) + delta)
+
+
+# Mantém estudos.questoes_total em qualquer inserção/remoção de Questao pelo ORM
+# (registrar_questoes, o worker ou o admin), com UPDATE relativo: seguro entre processos.
+# INSERTs em massa por session.execute(insert(Questao)) não passam por aqui.
+@event.listens_for(Questao, 'after_insert')
+def _questao_inserida(mapper, connection, questao):
+    _ajustar_total_questoes(connection, questao, 1)
+
+
+@event.listens_for(Questao, 'after_delete')
+def _questao_removida(mapper, connection, questao):
+    _ajustar_total_questoes(connection, questao, -1)
+
+
+# Conta as transições de Estudo.status (processando -> pronto/erro) na mesma
+# transação da escrita, venham da web ou do worker.
+@event.listens_for(Estudo, 'after_update')
+def _estudo_atualizado(mapper, connection, estudo):
+    historico = inspect(estudo).attrs.status.history
+    if historico.deleted and historico.added:
+        from app.services.metricas import registrar_transicao_status
+        registrar_transicao_status(historico.deleted[0], historico.added[0], connection)
+
+
+############ MÉTRICAS
+
+class Metrica(database.Model):
+    """Contador global da plataforma, mantido incrementalmente (ver services.metricas)."""
+    __tablename__ = 'metricas'
+
+    chave = database.Column(database.String(64), primary_key=True)
+    valor = database.Column(database.Integer, default=0, nullable=False)
+
+
+class MetricaDiaria(database.Model):
+    """Contador de atividade por dia (cadastros, estudos criados, correções)."""
+    __tablename__ = 'metricas_diarias'
+
+    dia = database.Column(database.Date, primary_key=True)
+    chave = database.Column(database.String(64), primary_key=True)
+    valor = database.Column(database.Integer, default=0, nullable=False)
+
+
+############ CACHE DE IA
+
+class ResultadoIACache(database.Model):
+    """
+    Resumo + questões já gerados para um texto, endereçados pelo hash do
+    texto normalizado, pela versão dos prompts e pelo modelo.
+    """
+    __tablename__ = 'cache_resultados_ia'
+
+    chave = database.Column(database.String(96), primary_key=True)
+    texto_hash = database.Column(database.String(32), nullable=False)
+    versao_prompt = database.Column(database.String(16), nullable=False)
+    modelo = database.Column(database.String(64), nullable=False)
+    resumo = database.Column(database.Text, nullable=False)
+    qcm_json = database.Column(database.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    tamanho_bytes = database.Column(database.Integer, nullable=False)
+    acessos = database.Column(database.Integer, default=0, nullable=False)
+    criado_em = database.Column(database.DateTime, default=now_brazil, nullable=False)
+    acessado_em = database.Column(database.DateTime, default=now_brazil, nullable=False, index=True)
+
+
+class CheckpointEstudo(database.Model):
+    """Saída de uma etapa do pipeline de IA, para retomar o estudo após uma falha."""
+    __tablename__ = 'checkpoints_estudo'
+
+    estudo_id = database.Column(database.Integer, database.ForeignKey('estudos.id', ondelete='CASCADE'),
+                                primary_key=True)
+    etapa = database.Column(database.String(30), primary_key=True)
+    dados = database.Column(database.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    # Versão do pipeline que gerou a saída; NULL = válida para qualquer versão
+    versao = database.Column(database.String(100))
+    criado_em = database.Column(database.DateTime, default=now_brazil, nullable=False)
@@ -1,22 +1,25 @@
 from flask import render_template, redirect, url_for, flash, request,jsonify, abort
 from flask_login import login_required, current_user
 from app import app, database, bcrypt
-from app.models import Usuario
+from app.models import Usuario, identidades, invalidar_identidade
 from app.forms import FormCriarUsuario, FormEditarUsuario
 from app.decorators import admin_required
 from werkzeug.utils import secure_filename
 
-from app.services.ai_health import deepseek_healthcheck
+from app.services.busca_usuarios import buscar_usuarios
+from app.services.cache_resultados import estatisticas_cache
+from app.services.metricas import ler_metricas, registrar_cadastro, registrar_exclusao_usuario
 import os
 
 @app.route('/admin', methods=['GET'])
 @login_required
 @admin_required
 def admin_dashboard():
-    total_usuarios = Usuario.query.count()
+    metricas = ler_metricas()
 
     return render_template('admin/admin_dashboard.html',
-                           total_usuarios=total_usuarios,
+                           total_usuarios=metricas['usuarios'],
+                           metricas=metricas,
                            ai_selftest_enabled=app.config.get('ENABLE_AI_SELFTEST', False))
 
 @app.route("/create_user", methods=['GET', 'POST'])
@@ -38,6 +41,7 @@ def admin_create_user():
             senha=senha_crypt
         )
         database.session.add(usuario)
+        registrar_cadastro()
         database.session.commit()
         flash(f'Usuário criado com e-mail: {form.email.data}. Senha inicial: {senha_gerada}', 'success')
         return redirect(url_for('listar_usuarios'))
@@ -48,23 +52,17 @@ def admin_create_user():
 @login_required
 @admin_required
 def listar_usuarios():
-    nome = request.args.get('nome', type=str)
-    email = request.args.get('email', type=str)
-    cpf = request.args.get('cpf', type=str)
-    whatsapp = request.args.get('whatsapp', type=str)
-
-    query = Usuario.query
-    if nome:
-        query = query.filter(Usuario.nome.ilike(f"%{nome}%"))
-    if email:
-        query = query.filter(Usuario.email.ilike(f"%{email}%"))
-    if cpf:
-        query = query.filter(Usuario.cpf.ilike(f"%{cpf}%"))
-    if whatsapp:
-        query = query.filter(Usuario.whatsapp.ilike(f"%{whatsapp}%"))
-
-    usuarios = query.all()
-    return render_template('admin/admin_listar_usuarios.html', usuarios=usuarios)
+    filtros = {campo: request.args.get(campo, type=str) for campo in ('nome', 'email', 'cpf', 'whatsapp')}
+    depois_de = request.args.get('depois_de', type=int)
+
+    usuarios, proximo_cursor = buscar_usuarios(depois_de=depois_de, **filtros)
+
+    proxima_pagina = None
+    if proximo_cursor:
+        args = {k: v for k, v in filtros.items() if v}
+        proxima_pagina = url_for('listar_usuarios', depois_de=proximo_cursor, **args)
+
+    return render_template('admin/admin_listar_usuarios.html', usuarios=usuarios, proxima_pagina=proxima_pagina)
 
 @app.route('/admin/usuario/<int:usuario_id>', methods=['GET'])
 @login_required
@@ -92,6 +90,7 @@ def editar_usuario(usuario_id):
 
         try:
             database.session.commit()
+            invalidar_identidade(usuario.id)
             flash('Usuário atualizado com sucesso!', 'success')
             return redirect(url_for('listar_usuarios'))
         except Exception as e:
@@ -107,7 +106,9 @@ def editar_usuario(usuario_id):
 def excluir_usuario(usuario_id):
     usuario = Usuario.query.get_or_404(usuario_id)
     database.session.delete(usuario)
+    registrar_exclusao_usuario()
     database.session.commit()
+    invalidar_identidade(usuario_id)
     flash('Usuário excluído com sucesso!', 'success')
     return redirect(url_for('listar_usuarios'))
 
@@ -138,7 +139,31 @@ def upload_file():
 def ai_selftest():
     if not app.config.get('ENABLE_AI_SELFTEST', False):
         return abort(404)  # oculta a existência da rota quando desativada
+    # Cliente do DeepSeek (httpx, tenacity) carregado só quando usado
+    from app.services.ai_health import deepseek_healthcheck
+
     result = deepseek_healthcheck()
     return jsonify(result), 200
 
 
+@app.route("/_metrics/identity-cache", methods=["GET"])
+@login_required
+@admin_required
+def metricas_identity_cache():
+    return jsonify(identidades.stats()), 200
+
+
+@app.route("/_metrics/prompt-cache", methods=["GET"])
+@login_required
+@admin_required
+def metricas_cache_prompts():
+    from app.integrations.deepseek import get_cache_prompts
+
+    return jsonify(get_cache_prompts().stats()), 200
+
+
+@app.route("/_metrics/ai-cache", methods=["GET"])
+@login_required
+@admin_required
+def metricas_cache_ia():
+    return jsonify(estatisticas_cache()), 200
@@ -1,30 +1,24 @@
-from flask import render_template, redirect, url_for, flash, request, abort
+from flask import render_template, redirect, url_for, flash, request, abort, jsonify
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-import boto3
-from botocore.exceptions import NoCredentialsError
 
 import os
+from datetime import timedelta
 
 from app import app, database
-from app.models import Estudo
-from app.services.task_producer import send_ai_task
+from app.models import Estudo, now_brazil
+from app.services.correcao import corrigir_respostas
+from app.services.extracao import extensoes_suportadas
+from app.services.metricas import registrar_estudo_criado
 
-ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
+ALLOWED_EXTENSIONS = extensoes_suportadas()
+RESUMO_AGUARDANDO = "Aguardando processamento da IA..."
 
 def allowed_file(filename):
     """Verifica se a extensão do arquivo é permitida."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_r2_client():
-    return boto3.client(
-        's3',
-        endpoint_url=f"https://{os.getenv('R2_ACCOUNT_ID')}.r2.cloudflarestorage.com",
-        aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY')
-    )
-
 @app.route('/novo-estudo', methods=['GET', 'POST'])
 @login_required
 def novo_estudo():
@@ -32,7 +26,8 @@ def novo_estudo():
         return render_template(
             'user/novo_estudo.html',
             usuario=current_user,
-            titulo_pagina='Novo Estudo'
+            titulo_pagina='Novo Estudo',
+            extensoes=sorted(ALLOWED_EXTENSIONS)
         )
 
     if request.method == 'POST':
@@ -46,6 +41,10 @@ def novo_estudo():
 
         filename = secure_filename(file.filename)
 
+        # boto3 e pika só são carregados no upload, não no boot do worker web
+        from app.integrations.storage import get_r2_client
+        from app.services.task_producer import send_ai_task
+
         try:
             r2 = get_r2_client()
             r2.upload_fileobj(
@@ -63,11 +62,12 @@ def novo_estudo():
             novo_estudo = Estudo(
                 user_id=current_user.id,
                 titulo=nome_estudo or filename,
-                resumo="Aguardando processamento da IA...",
+                resumo=RESUMO_AGUARDANDO,
                 status='processando',
                 caminho_arquivo=filename
             )
             database.session.add(novo_estudo)
+            registrar_estudo_criado(novo_estudo.status)
             database.session.commit()
             app.logger.info(f"[Flask WEB] Enviando tarefa. ID: {novo_estudo.id}, Arquivo: {filename}")
 
@@ -99,6 +99,19 @@ def visualizar_estudo(estudo_id):
     if estudo.user_id != current_user.id:
         abort(403)
 
+    if estudo.status == 'processando':
+        # Resumo parcial consultado pela página em /estudo/<id>/resumo/parcial
+        return render_template(
+            'user/visualizar_estudo.html',
+            usuario=current_user,
+            estudo=estudo,
+            questoes=[],
+            processando=True,
+            resumo_aguardando=RESUMO_AGUARDANDO,
+            intervalo_consulta_ms=int(float(app.config.get('AI_STREAM_POLL_SECONDS', 1)) * 1000),
+            titulo_pagina=estudo.titulo
+        )
+
     if estudo.status != 'pronto':
         flash('Este material ainda está sendo processado ou falhou.', 'info')
         return redirect(url_for('painel_usuario'))
@@ -114,34 +127,83 @@ def visualizar_estudo(estudo_id):
     )
 
 
-@app.route('/estudo/<int:estudo_id>/corrigir', methods=['POST'])
+@app.route('/estudo/<int:estudo_id>/resumo/parcial')
 @login_required
-def corrigir_estudo(estudo_id):
+def resumo_parcial(estudo_id):
+    """
+    Resumo parcial gravado pelo worker, consultado pela página a cada
+    AI_STREAM_POLL_SECONDS (requisições curtas: não prende um worker do
+    gunicorn). 'fim' indica que o estudo saiu de 'processando'; 'timeout',
+    que passou de AI_STREAM_MAX_SECONDS processando. Nos dois casos o
+    cliente para de consultar.
+    """
     estudo = database.session.get(Estudo, estudo_id)
+    if not estudo:
+        abort(404)
 
-    if not estudo or estudo.user_id != current_user.id:
+    if estudo.user_id != current_user.id:
         abort(403)
 
-    acertos = 0
-    total_questoes = 0
+    processando = estudo.status == 'processando'
+    expirado = processando and database.session.query(
+        database.session.query(Estudo).filter(
+            Estudo.id == estudo_id,
+            Estudo.data_criacao < now_brazil() - timedelta(seconds=float(app.config.get('AI_STREAM_MAX_SECONDS', 600)))
+        ).exists()
+    ).scalar()
+    resposta = jsonify({
+        'status': estudo.status,
+        'resumo': estudo.resumo if processando and estudo.resumo != RESUMO_AGUARDANDO else '',
+        'fim': not processando,
+        'timeout': expirado,
+    })
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
 
-    questoes = estudo.questoes.all()
 
-    for questao in questoes:
-        resposta_enviada = request.form.get(f'questao-{questao.id}')
+@app.route('/estudo/<int:estudo_id>/corrigir', methods=['POST'])
+@login_required
+def corrigir_estudo(estudo_id):
+    estudo = database.session.get(Estudo, estudo_id)
+
+    if not estudo or estudo.user_id != current_user.id:
+        abort(403)
 
-        if resposta_enviada:
-            questao.resposta_usuario = resposta_enviada
+    respostas = {}
+    for campo, valor in request.form.items():
+        if campo.startswith('questao-') and campo[len('questao-'):].isdigit():
+            respostas[int(campo[len('questao-'):])] = valor
 
-            if resposta_enviada.strip() == questao.resposta_correta.strip():
-                questao.correta = True
-                acertos += 1
-            else:
-                questao.correta = False
+    resultado = corrigir_respostas(estudo, respostas)
 
-        total_questoes += 1
+    flash(f'Correção concluída! Você acertou {resultado["acertos"]} de {resultado["total"]} questões.', 'success')
+    return redirect(url_for('visualizar_estudo', estudo_id=estudo.id))
 
-    database.session.commit()
 
-    flash(f'Correção concluída! Você acertou {acertos} de {total_questoes} questões.', 'success')
-    return redirect(url_for('visualizar_estudo', estudo_id=estudo.id))
\ No newline at end of file
+@app.route('/api/estudo/<int:estudo_id>/respostas', methods=['POST'])
+@login_required
+def api_corrigir_estudo(estudo_id):
+    """
+    Corrige as respostas enviadas em JSON e devolve a nota na mesma chamada.
+    Corpo: {"respostas": {"<questao_id>": "<opção escolhida>", ...}}
+    """
+    estudo = database.session.get(Estudo, estudo_id)
+    if not estudo or estudo.user_id != current_user.id:
+        return jsonify({'error': 'Estudo não encontrado.'}), 404
+    if estudo.status != 'pronto':
+        return jsonify({'error': 'Estudo ainda não está pronto.'}), 409
+
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({'error': 'Corpo deve ser um objeto JSON.'}), 400
+    respostas_json = dados.get('respostas')
+    if not isinstance(respostas_json, dict):
+        return jsonify({'error': "Campo 'respostas' deve ser um objeto {questao_id: resposta}."}), 400
+
+    try:
+        respostas = {int(k): str(v) for k, v in respostas_json.items() if v is not None}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'IDs de questão inválidos.'}), 400
+
+    resultado = corrigir_respostas(estudo, respostas)
+    return jsonify({'estudo_id': estudo.id, **resultado}), 200
@@ -1,13 +1,17 @@
-from flask import render_template
+from flask import render_template, request, url_for, abort
 from flask_login import login_required, current_user
+from sqlalchemy import func, case, and_, or_
+from datetime import datetime
 
 import os
 
-from app import app
+from app import app, database
 from app.models import Estudo
+from app.services.extracao import extensoes_suportadas
 
 UPLOAD_FOLDER = os.getenv('UPLOAD_DIR', os.path.join(os.getcwd(), 'app', 'static', 'uploads'))
-ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
+ALLOWED_EXTENSIONS = extensoes_suportadas()
+ESTUDOS_POR_PAGINA = 20
 
 def allowed_file(filename):
     """Verifica a extensão do arquivo."""
@@ -15,29 +19,98 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-@app.route('/painel', methods=['GET'])
-@login_required
-def painel_usuario():
-    todos_estudos = Estudo.query.filter_by(user_id=current_user.id) \
-        .order_by(Estudo.data_criacao.desc()).all()
+def estatisticas_painel(user_id):
+    """
+    Calcula os números do cabeçalho do painel numa única consulta agregada
+    (GROUP BY status/respondido) sobre as colunas agregadas de Estudo.
+    """
+    nota = case(
+        (Estudo.questoes_total > 0, Estudo.questoes_acertos * 100 // Estudo.questoes_total),
+        else_=0
+    )
+    linhas = database.session.query(
+        Estudo.status,
+        Estudo.respondido,
+        func.count(Estudo.id),
+        func.coalesce(func.sum(nota), 0),
+    ).filter(Estudo.user_id == user_id) \
+        .group_by(Estudo.status, Estudo.respondido).all()
+
+    total_respondidos = 0
+    soma_notas = 0
+    qtd_pendentes = 0
+    for status, respondido, quantidade, notas in linhas:
+        if status != 'pronto':
+            continue
+        if respondido:
+            total_respondidos += quantidade
+            soma_notas += notas
+        else:
+            qtd_pendentes += quantidade
 
-    estudos_prontos = [e for e in todos_estudos if e.status == 'pronto']
+    score_medio = int(soma_notas / total_respondidos) if total_respondidos > 0 else 0
+    return {
+        'total_estudos_feitos': total_respondidos,
+        'score_medio': score_medio,
+        'qtd_pendentes': qtd_pendentes,
+    }
 
-    estudos_concluidos = [e for e in estudos_prontos if e.foi_respondido]
 
-    total_respondidos = len(estudos_concluidos)
+def _ler_cursor(cursor):
+    """Converte o cursor 'data_iso|id' em (datetime, id); aborta com 400 se inválido."""
+    try:
+        data_iso, estudo_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(data_iso), int(estudo_id)
+    except (ValueError, AttributeError):
+        abort(400)
 
-    soma_notas = sum([e.aproveitamento for e in estudos_concluidos])
-    score_medio = int(soma_notas / total_respondidos) if total_respondidos > 0 else 0
-    estudos_pendentes = [e for e in estudos_prontos if not e.foi_respondido]
+
+def pagina_estudos(user_id, cursor=None, limite=ESTUDOS_POR_PAGINA):
+    """
+    Retorna (estudos, proximo_cursor) usando paginação keyset em
+    (data_criacao, id) decrescente; o custo independe da página.
+    """
+    query = Estudo.query.filter(Estudo.user_id == user_id)
+    if cursor:
+        data_criacao, estudo_id = _ler_cursor(cursor)
+        query = query.filter(or_(
+            Estudo.data_criacao < data_criacao,
+            and_(Estudo.data_criacao == data_criacao, Estudo.id < estudo_id)
+        ))
+
+    estudos = query.order_by(Estudo.data_criacao.desc(), Estudo.id.desc()) \
+        .limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(estudos) > limite:
+        estudos = estudos[:limite]
+        ultimo = estudos[-1]
+        proximo_cursor = f"{ultimo.data_criacao.isoformat()}|{ultimo.id}"
+    return estudos, proximo_cursor
+
+
+@app.route('/painel', methods=['GET'])
+@login_required
+def painel_usuario():
+    estudos, proximo_cursor = pagina_estudos(current_user.id)
 
     return render_template(
         'user/painel_usuario.html',
         usuario=current_user,
-        ultimos_estudos=todos_estudos,  # Passamos a lista completa para iterar
-        total_estudos_feitos=total_respondidos,
-        score_medio=score_medio,
-        qtd_pendentes=len(estudos_pendentes)
+        ultimos_estudos=estudos,
+        proxima_pagina=url_for('painel_estudos', cursor=proximo_cursor) if proximo_cursor else None,
+        **estatisticas_painel(current_user.id)
     )
 
 
+@app.route('/painel/estudos', methods=['GET'])
+@login_required
+def painel_estudos():
+    """Fragmento HTML com a próxima página de estudos (scroll infinito)."""
+    estudos, proximo_cursor = pagina_estudos(current_user.id, request.args.get('cursor'))
+
+    return render_template(
+        'user/_lista_estudos.html',
+        ultimos_estudos=estudos,
+        proxima_pagina=url_for('painel_estudos', cursor=proximo_cursor) if proximo_cursor else None
+    )
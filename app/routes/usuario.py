@@ -1,11 +1,12 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, abort, make_response
 from flask_login import login_required, current_user
 from app import app, database, bcrypt, mail, s
 from app.forms import FormCriarConta, FormSolicitarRecuperacao, FormRedefinirSenha
-from app.models import Usuario
+from app.models import Usuario, invalidar_identidade
 from itsdangerous import SignatureExpired, BadSignature
 from flask_mail import Message
-import base64
+from app.services.foto_perfil import salvar_foto_perfil, remover_versao_foto, ler_foto_perfil
+from app.services.metricas import registrar_cadastro
 
 
 @app.route("/createlogin", methods=['GET', 'POST'])
@@ -26,6 +27,7 @@ def createlogin():
             is_validated=True
         )
         database.session.add(usuario)
+        registrar_cadastro()
         database.session.commit()
 
         flash('Conta criada com sucesso!.', 'info')
@@ -78,25 +80,53 @@ def resetar_senha(token):
         if usuario:
             usuario.senha = bcrypt.generate_password_hash(form.nova_senha.data).decode('utf-8')
             database.session.commit()
+            invalidar_identidade(usuario.id)
             flash('Sua senha foi atualizada com sucesso!', 'success')
             return redirect(url_for('login'))
 
     return render_template('resetar-senha.html', form=form, token=token)
 
-def converter_imagem_para_base64(file_storage):
-    """
-    Converte um arquivo de imagem (FileStorage) para string base64.
-    Retorna None se o arquivo estiver vazio.
-    """
-    if not file_storage or file_storage.filename == '':
-        return None
+@app.route('/perfil/foto', methods=['POST'])
+@login_required
+def atualizar_foto_perfil():
+    file = request.files.get('foto_perfil')
+    if not file or file.filename == '':
+        flash('Selecione uma imagem.', 'danger')
+        return redirect(request.referrer or url_for('painel_usuario'))
 
+    usuario = database.session.get(Usuario, current_user.id)
     try:
-        imagem_bytes = file_storage.read()
-        return base64.b64encode(imagem_bytes).decode('utf-8')
-    except Exception as e:
-        print(f"Erro ao converter imagem: {e}")
-        return None
+        anterior = salvar_foto_perfil(usuario, file.read())
+        database.session.commit()
+    except ValueError as e:
+        database.session.rollback()
+        flash(str(e), 'danger')
+    else:
+        # Só depois do commit: antes dele o usuário ainda aponta para a versão anterior
+        remover_versao_foto(usuario.id, anterior)
+        invalidar_identidade(usuario.id)
+        flash('Foto de perfil atualizada!', 'success')
 
+    return redirect(request.referrer or url_for('painel_usuario'))
 
 
+@app.route('/usuario/<int:usuario_id>/foto/<versao>/<tamanho>.webp')
+@login_required
+def foto_perfil(usuario_id, versao, tamanho):
+    """
+    Serve uma variante da foto. A URL muda a cada nova foto, então a
+    resposta pode ficar em cache indefinidamente.
+    """
+    etag = f"{versao}-{tamanho}"
+    if request.if_none_match.contains(etag):
+        resposta = make_response('', 304)
+    else:
+        dados = ler_foto_perfil(usuario_id, versao, tamanho)
+        if dados is None:
+            abort(404)
+        resposta = make_response(dados)
+        resposta.mimetype = 'image/webp'
+
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return resposta
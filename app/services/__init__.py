@@ -1,2 +1,52 @@
-from .ai_health import *
-from .ai_processor import *
+"""
+Serviços da aplicação.
+
+Os submódulos são importados sob demanda (PEP 562): 'from app.services
+import process_study_material' continua funcionando, mas importar o pacote
+(ou um serviço leve, como metricas) não carrega LangChain, pypdf etc. no
+processo web. 'flask verificar-imports' acusa regressões.
+"""
+import importlib
+
+_EXPORTS = {
+    'ai_health': ('deepseek_healthcheck',),
+    'ai_processor': (
+        'Questao', 'QCM_Output', 'load_document', 'resumir_documento', 'gerar_qcm', 'revisar_qcm',
+        'interpretar_qcm', 'process_study_material', 'VERSAO_PROMPTS', 'TOPOLOGIAS',
+    ),
+    'correcao': ('corrigir_respostas',),
+    'busca_usuarios': ('buscar_usuarios', 'USUARIOS_POR_PAGINA'),
+    'metricas': (
+        'registrar_cadastro', 'registrar_exclusao_usuario', 'registrar_estudo_criado',
+        'registrar_transicao_status', 'registrar_correcao', 'ler_metricas', 'reconciliar_metricas',
+    ),
+    'cache_resultados': (
+        'normalizar_texto', 'hash_conteudo', 'buscar_resultado', 'guardar_resultado',
+        'clonar_para_estudo', 'estatisticas_cache',
+    ),
+    'resumo_parcial': ('PublicadorResumo',),
+    'orcamento_tokens': ('PerfilEtapa', 'perfil', 'estimar_tokens', 'tamanho_trecho', 'calibrar', 'resumir_uso'),
+    'checkpoints': ('Checkpoints', 'possui_checkpoint', 'limpar_checkpoints', 'limpar_checkpoints_antigos'),
+    'extracao': (
+        'registrar_extrator', 'extensoes_suportadas', 'iterar_paginas', 'extrair_texto', 'extrair_com_chave',
+        'chave_extracao', 'em_cache', 'texto_em_cache',
+    ),
+    'selecao_trechos': ('METODOS_SELECAO', 'metodo_selecao', 'pontuar_trechos', 'selecionar_trechos'),
+    'cache_extracao': ('hash_arquivo', 'DocumentoExtraido', 'CacheExtracao', 'get_cache_extracao'),
+}
+_MODULO_DE = {nome: modulo for modulo, nomes in _EXPORTS.items() for nome in nomes}
+
+__all__ = list(_MODULO_DE)
+
+
+def __getattr__(nome):
+    modulo = _MODULO_DE.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f"{__name__}.{modulo}"), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -8,7 +8,8 @@ def deepseek_healthcheck() -> dict:
                 {"role": "user", "content": "Responda 'OK'."}
             ],
             temperature=0.0,
-            timeout=10
+            timeout=10,
+            cache=False
         )
         ok = content.strip().upper().startswith("OK")
         return {"ok": ok, "model_reply": content if ok else "unexpected_reply"}
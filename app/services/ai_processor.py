@@ -1,11 +1,29 @@
+import json
+import logging
 import os
-from typing import Dict, List, Optional
-from langchain_community.document_loaders import PyPDFLoader, UnstructuredWordDocumentLoader, TextLoader
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from flask import current_app
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+from app import database
 from app.integrations.deepseek import DeepSeekLLM
+from app.models import Estudo
+from app.services.cache_resultados import buscar_resultado, clonar_para_estudo, guardar_resultado, hash_conteudo
+from app.services.checkpoints import Checkpoints
+from app.services.extracao import VERSAO_EXTRACAO, extrair_com_chave, extrair_texto, texto_em_cache
+from app.services.orcamento_tokens import calibrar, perfil, resumir_uso, tamanho_trecho
+from app.services.selecao_trechos import metodo_selecao, selecionar_trechos
+
+log = logging.getLogger(__name__)
+
+# Incrementar ao mudar qualquer prompt ou perfil padrão de etapa: invalida o cache de resultados de IA.
+VERSAO_PROMPTS = "2"
 
 
 class Questao(BaseModel):
@@ -22,69 +40,323 @@ class QCM_Output(BaseModel):
 
 def load_document(file_path: str) -> str:
     """Carrega o conteúdo de um documento (PDF/DOCX/TXT) e o retorna como texto simples."""
-    file_extension = os.path.splitext(file_path)[1].lower()
+    return extrair_texto(file_path)
+
+
+RESUMO_PROMPT = PromptTemplate.from_template(
+    "Você é um tutor especializado. Crie um resumo conciso, didático e focado em pontos-chave a partir do texto a seguir. O resumo deve ter no máximo 300 palavras. TEXTO: {text}"
+)
+
+# Map: resumo parcial de um trecho; Reduce: consolida resumos parciais.
+MAP_PROMPT = PromptTemplate.from_template(
+    "Você é um tutor especializado. Resuma o trecho a seguir, que faz parte de um documento maior, preservando conceitos, definições e dados importantes. Use no máximo 200 palavras. TRECHO: {text}"
+)
+REDUCE_PROMPT = PromptTemplate.from_template(
+    "Você é um tutor especializado. Os textos a seguir são resumos parciais e consecutivos de um mesmo documento. Combine-os num único resumo coeso, sem repetições, com no máximo 300 palavras. RESUMOS PARCIAIS:\n\n{text}"
+)
+
+QCM_PROMPT = PromptTemplate.from_template(
+    "Com base no texto fornecido, gere **EXATAMENTE 5** questões de múltipla escolha (QCM). Cada questão deve ter **4 opções** de resposta (A, B, C, D) e uma única resposta correta. Use a formatação JSON específica do esquema Pydantic. TEXTO: {text}\n\n{format_instructions}"
+)
+
+# Topologia paralela: as questões saem do texto-fonte, então são conferidas contra o resumo.
+CONSISTENCIA_PROMPT = PromptTemplate.from_template(
+    "Você é um revisor de material didático. Abaixo estão um RESUMO e QUESTÕES geradas a partir do mesmo documento. Mantenha as questões cujo conteúdo é coerente com o resumo; reescreva as que tratam de detalhes ausentes do resumo ou que tenham resposta ambígua, sempre com **EXATAMENTE 5** questões, **4 opções** cada e uma única resposta correta idêntica a uma das opções. Responda apenas no formato JSON do esquema Pydantic.\n\nRESUMO: {resumo}\n\nQUESTÕES: {questoes}\n\n{format_instructions}"
+)
+
+# JSON malformado: corrige a estrutura da resposta em vez de gerar as questões de novo.
+REPARO_PROMPT = PromptTemplate.from_template(
+    "O texto abaixo deveria ser um JSON válido no esquema indicado, mas falhou na validação com o erro: {erro}\n\nCorrija apenas a estrutura e a formatação, sem alterar o conteúdo das questões, e responda somente com o JSON.\n\n{format_instructions}\n\nTEXTO: {text}"
+)
 
-    if file_extension == '.pdf':
-        loader = PyPDFLoader(file_path)
-    elif file_extension == '.docx':
-        loader = UnstructuredWordDocumentLoader(file_path)
-    elif file_extension == '.txt':
-        loader = TextLoader(file_path, encoding='utf-8')
-    else:
-        raise ValueError(f"Extensão de arquivo não suportada: {file_extension}")
+TOPOLOGIAS = ('sequencial', 'paralelo')
 
-    docs = loader.load()
 
-    full_text = " ".join(doc.page_content for doc in docs)
-    return full_text
+def _cfg_int(key: str, default: int) -> int:
+    return int((current_app.config.get(key) if current_app else None) or os.getenv(key, default))
 
 
-def process_study_material(file_path: str, titulo: Optional[str] = "Estudo Gerado por IA") -> Dict:
+def _llm_etapa(llm, etapa: str):
+    """O mesmo LLM com o perfil (modelo, max_tokens, temperatura) da etapa."""
+    p = perfil(etapa)
+    return llm.com_perfil(etapa, model=p.model, temperature=p.temperature, max_tokens=p.max_tokens)
+
+
+def _gerar(llm, prompt: str, ao_progresso: Optional[Callable[[str], None]] = None) -> str:
+    """
+    invoke(), ou stream() repassando o texto acumulado a ao_progresso a cada
+    pedaço. Ao fim, chama ao_progresso.concluir(), se existir (PublicadorResumo
+    grava o texto retido pelo intervalo).
+    """
+    if ao_progresso is None or not hasattr(llm, 'stream'):
+        return llm.invoke(prompt)
+    texto = ""
+    for pedaco in llm.stream(prompt):
+        texto += pedaco
+        ao_progresso(texto)
+    concluir = getattr(ao_progresso, 'concluir', None)
+    if concluir is not None:
+        concluir()
+    return texto
+
+
+def resumir_documento(llm, trechos: List[str], ao_progresso: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Resumo map-reduce do documento inteiro.
+
+    Map: cada trecho é resumido em paralelo, pelo cliente assíncrono
+    (DeepSeekLLM.batch, até AI_MAP_MAX_WORKERS chamadas simultâneas). Reduce: os resumos parciais são combinados em grupos de
+    AI_REDUCE_FANIN até sobrar um, então o tempo cresce com log(trechos).
+    AI_MAX_TOTAL_TOKENS limita o volume de texto enviado no map: acima dele,
+    seguem os trechos mais relevantes (services/selecao_trechos).
+
+    Se ao_progresso for passado, a chamada que produz o resumo final é feita
+    em streaming e ao_progresso recebe o texto parcial conforme ele chega.
+    """
+    if not trechos:
+        return ""
+    if len(trechos) == 1:
+        return _gerar(_llm_etapa(llm, 'resumo'), RESUMO_PROMPT.format(text=trechos[0]), ao_progresso)
+
+    llm_map = _llm_etapa(llm, 'map')
+    llm_reduce = _llm_etapa(llm, 'reduce')
+
+    max_workers = _cfg_int('AI_MAP_MAX_WORKERS', 4)
+    fanin = max(2, _cfg_int('AI_REDUCE_FANIN', 4))
+    trechos = selecionar_trechos(trechos, _cfg_int('AI_MAX_TOTAL_TOKENS', 60000))
+
+    parciais = llm_map.batch([MAP_PROMPT.format(text=t) for t in trechos], max_concurrency=max_workers)
+
+    while len(parciais) > 1:
+        grupos = ["\n\n".join(parciais[i:i + fanin]) for i in range(0, len(parciais), fanin)]
+        if len(grupos) == 1:
+            return _gerar(llm_reduce, REDUCE_PROMPT.format(text=grupos[0]), ao_progresso)
+        parciais = llm_reduce.batch([REDUCE_PROMPT.format(text=g) for g in grupos], max_concurrency=max_workers)
+
+    return parciais[0]
+
+
+def _dividir_texto(full_text: str) -> List[str]:
+    """Trechos do tamanho que cabe no prompt do map (sobreposição de 5%)."""
+    tamanho = tamanho_trecho(MAP_PROMPT.template, 'map')
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=tamanho,
+        chunk_overlap=tamanho // 20
+    )
+    texts = text_splitter.create_documents([full_text])
+
+    return [t.page_content for t in texts] or [full_text[:8000]]
+
+
+def _texto_documento(cp: Checkpoints, file_path: str) -> str:
+    """
+    Texto extraído do documento. O checkpoint 'extracao' guarda só a chave do
+    cache de extração; se a entrada saiu do cache, o arquivo é lido de novo.
+    """
+    referencia = cp.obter('extracao')
+    if isinstance(referencia, dict):
+        texto = texto_em_cache(referencia['chave'])
+        if texto is not None:
+            cp.restaurados.append('extracao')
+            return texto
+
+    texto, chave = extrair_com_chave(file_path)
+    if chave is not None:
+        cp.gravar('extracao', {'chave': chave}, versionado=False)
+    return texto
+
+
+@contextmanager
+def _cronometro(tempos: Dict[str, float], etapa: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos[etapa] = round(time.perf_counter() - inicio, 3)
+
+
+def interpretar_qcm(llm, bruto: str) -> QCM_Output:
+    """
+    Valida a resposta do LLM no esquema QCM_Output. Se falhar, tenta antes
+    isolar o objeto JSON do texto em volta e, por último, pede ao LLM só o
+    reparo do JSON (até AI_REPARO_TENTATIVAS vezes), sem gerar as questões
+    de novo.
+    """
+    parser = PydanticOutputParser(pydantic_object=QCM_Output)
+    try:
+        return parser.parse(bruto)
+    except OutputParserException as e:
+        erro = e
+
+    inicio, fim = bruto.find('{'), bruto.rfind('}')
+    if 0 <= inicio < fim:
+        try:
+            return parser.parse(bruto[inicio:fim + 1])
+        except OutputParserException:
+            pass
+
+    llm_reparo = _llm_etapa(llm, 'reparo')
+    for _ in range(_cfg_int('AI_REPARO_TENTATIVAS', 1)):
+        bruto = llm_reparo.invoke(REPARO_PROMPT.format(
+            erro=str(erro).splitlines()[0],
+            text=bruto,
+            format_instructions=parser.get_format_instructions()
+        ))
+        try:
+            return parser.parse(bruto)
+        except OutputParserException as e:
+            erro = e
+    raise erro
+
+
+def gerar_qcm(llm, texto: str, checkpoints: Optional[Checkpoints] = None) -> QCM_Output:
+    cp = checkpoints or Checkpoints()
+    parser = PydanticOutputParser(pydantic_object=QCM_Output)
+    bruto = cp.executar('qcm_bruto', lambda: _llm_etapa(llm, 'qcm').invoke(
+        QCM_PROMPT.format(text=texto, format_instructions=parser.get_format_instructions())
+    ))
+    return QCM_Output(**cp.executar('qcm', lambda: interpretar_qcm(llm, bruto).dict()))
+
+
+def revisar_qcm(llm, resumo: str, qcm: QCM_Output, checkpoints: Optional[Checkpoints] = None) -> QCM_Output:
+    """Passo de consistência da topologia paralela: alinha as questões ao resumo."""
+    cp = checkpoints or Checkpoints()
+    parser = PydanticOutputParser(pydantic_object=QCM_Output)
+    bruto = cp.executar('consistencia_bruto', lambda: _llm_etapa(llm, 'consistencia').invoke(CONSISTENCIA_PROMPT.format(
+        resumo=resumo,
+        questoes=json.dumps(qcm.dict(), ensure_ascii=False),
+        format_instructions=parser.get_format_instructions()
+    )))
+    return QCM_Output(**cp.executar('consistencia', lambda: interpretar_qcm(llm, bruto).dict()))
+
+
+def _topologia() -> str:
+    topologia = ((current_app.config.get('AI_PIPELINE') if current_app else None)
+                 or os.getenv('AI_PIPELINE', 'sequencial'))
+    if topologia not in TOPOLOGIAS:
+        raise ValueError(f"AI_PIPELINE inválido: {topologia} (use {' ou '.join(TOPOLOGIAS)})")
+    return topologia
+
+
+def _resumo_e_qcm_paralelos(llm, trechos: List[str], ao_progresso, tempos: Dict[str, float], cp: Checkpoints):
+    """
+    Resumo e questões ao mesmo tempo: as questões saem direto dos trechos
+    (os mais relevantes até AI_QCM_MAX_TOKENS), sem esperar o resumo.
+    """
+    fonte = "\n\n".join(selecionar_trechos(trechos, _cfg_int('AI_QCM_MAX_TOKENS', 12000)))
+    app = current_app._get_current_object() if current_app else None
+
+    def etapa(nome, funcao, *args):
+        with _cronometro(tempos, nome):
+            if app is None:
+                return funcao(*args)
+            with app.app_context():
+                return funcao(*args)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futuro_resumo = pool.submit(etapa, 'resumo', cp.executar, 'resumo', resumir_documento, llm, trechos, ao_progresso)
+        futuro_qcm = pool.submit(etapa, 'qcm', gerar_qcm, llm, fonte, cp)
+        resumo = futuro_resumo.result()
+        qcm_data = futuro_qcm.result()
+
+    with _cronometro(tempos, 'consistencia'):
+        qcm_data = revisar_qcm(llm, resumo, qcm_data, cp)
+    return resumo, qcm_data
+
+
+def _gravar_resultado(estudo_id: Optional[int], resultado: Dict) -> bool:
+    """Grava o resultado no Estudo (clonar_para_estudo faz o commit); sem estudo, só confirma o cache."""
+    estudo = database.session.get(Estudo, estudo_id) if estudo_id is not None else None
+    if estudo is None:
+        database.session.commit()
+        return False
+    clonar_para_estudo(estudo, resultado)
+    return True
+
+
+def process_study_material(file_path: str, titulo: Optional[str] = "Estudo Gerado por IA",
+                           ao_progresso: Optional[Callable[[str], None]] = None,
+                           estudo_id: Optional[int] = None) -> Dict:
     """
     Função principal que realiza o resumo e a geração de QCM de forma síncrona.
 
     :param file_path: Caminho local do arquivo.
     :param titulo: Título fornecido pelo usuário.
-    :return: Dicionário com 'resumo', 'qcm' (JSON) e 'status'.
+    :param ao_progresso: Opcional; recebe o resumo parcial durante o streaming (ex.: PublicadorResumo).
+    :param estudo_id: Opcional; grava a saída de cada etapa em checkpoints, e uma nova
+                      chamada para o mesmo estudo retoma da última etapa concluída. No
+                      sucesso o resultado é gravado no Estudo (resumo, questões, status
+                      'pronto') e os checkpoints são apagados, na mesma transação.
+    :return: Dicionário com 'resumo', 'qcm' (JSON), 'status', 'tempos' (segundos por etapa),
+             'tokens' (totais por etapa), 'uso' (tokens de cada chamada ao LLM) e
+             'gravado' (o Estudo já recebeu o resultado; o chamador não deve gravá-lo de novo).
+
+    AI_PIPELINE escolhe a topologia: 'sequencial' (questões geradas a partir
+    do resumo) ou 'paralelo' (questões geradas do texto-fonte junto com o
+    resumo, seguidas de um passo de consistência).
     """
+    tempos = {}
+    inicio = time.perf_counter()
+    cp = None
     try:
-        full_text = load_document(file_path)
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=4000,
-            chunk_overlap=200
-        )
-        texts = text_splitter.create_documents([full_text])
+        topologia = _topologia()
+        # A seleção de trechos muda o texto enviado ao LLM, então também entra na versão
+        versao = f"{VERSAO_PROMPTS}-{topologia}-{metodo_selecao()}"
+        # Os trechos dependem também do extrator; os checkpoints só valem na mesma versão
+        cp = Checkpoints(estudo_id, versao=f"{versao}-e{VERSAO_EXTRACAO}")
 
-        context_text = texts[0].page_content if texts else full_text[:8000]
+        with _cronometro(tempos, 'extracao'):
+            full_text = _texto_documento(cp, file_path)
 
         llm = DeepSeekLLM()
 
-        resumo_prompt = PromptTemplate.from_template(
-            "Você é um tutor especializado. Crie um resumo conciso, didático e focado em pontos-chave a partir do texto a seguir. O resumo deve ter no máximo 300 palavras. TEXTO: {text}"
-        )
-        resumo_chain = resumo_prompt | llm
-        resumo = resumo_chain.invoke({"text": context_text})
+        usar_cache = current_app and current_app.config.get('AI_RESULT_CACHE', True)
+        if usar_cache:
+            texto_hash = hash_conteudo(full_text)
+            em_cache = buscar_resultado(texto_hash, versao, llm.model)
+            if em_cache is not None:
+                gravado = _gravar_resultado(estudo_id, em_cache)
+                tempos['total'] = round(time.perf_counter() - inicio, 3)
+                return {"status": "completed", "titulo": titulo, "cache": True, "tempos": tempos,
+                        "gravado": gravado, **em_cache}
+
+        # Dividir é rápido e determinístico: refeito a cada tentativa em vez de gravado
+        trechos = _dividir_texto(full_text)
 
-        parser = PydanticOutputParser(pydantic_object=QCM_Output)
+        if topologia == 'paralelo':
+            resumo, qcm_data = _resumo_e_qcm_paralelos(llm, trechos, ao_progresso, tempos, cp)
+        else:
+            with _cronometro(tempos, 'resumo'):
+                resumo = cp.executar('resumo', resumir_documento, llm, trechos, ao_progresso)
+            with _cronometro(tempos, 'qcm'):
+                qcm_data = gerar_qcm(llm, resumo, cp)
 
-        qcm_prompt = PromptTemplate.from_template(
-            "Com base no texto fornecido, gere **EXATAMENTE 5** questões de múltipla escolha (QCM). Cada questão deve ter **4 opções** de resposta (A, B, C, D) e uma única resposta correta. Use a formatação JSON específica do esquema Pydantic. TEXTO: {text}\n\n{format_instructions}"
-        )
+        if usar_cache:
+            guardar_resultado(texto_hash, versao, llm.model, resumo, qcm_data.dict())
+        gravado = _gravar_resultado(estudo_id, {'resumo': resumo, 'qcm_json': qcm_data.dict()})
 
-        qcm_chain = qcm_prompt.partial(format_instructions=parser.get_format_instructions()) | llm
-        qcm_raw = qcm_chain.invoke({"text": resumo})
-        qcm_data = parser.parse(qcm_raw)
+        tempos['total'] = round(time.perf_counter() - inicio, 3)
+        calibrar(llm.uso)
+        tokens = resumir_uso(llm.uso)
+        log.info(f"[IA] {titulo!r} ({topologia}, {len(trechos)} trechos) tempos: {tempos} tokens: {tokens}"
+                 + (f" retomado de: {cp.restaurados}" if cp.restaurados else ""))
 
         return {
             "status": "completed",
             "titulo": titulo,
             "resumo": resumo,
-            "qcm_json": qcm_data.dict()
+            "qcm_json": qcm_data.dict(),
+            "tempos": tempos,
+            "tokens": tokens,
+            "uso": llm.uso,
+            "retomado": cp.restaurados,
+            "gravado": gravado
         }
 
     except ValueError as e:
-        return {"status": "failed", "error": f"Erro de validação: {e}"}
+        database.session.rollback()
+        return {"status": "failed", "error": f"Erro de validação: {e}", "checkpoints": cp.etapas if cp else []}
     except Exception as e:
-        return {"status": "failed", "error": f"Erro de Processamento de IA: {e}"}
+        database.session.rollback()
+        return {"status": "failed", "error": f"Erro de Processamento de IA: {e}", "checkpoints": cp.etapas if cp else []}
 
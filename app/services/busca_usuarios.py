@@ -0,0 +1,74 @@
+import sqlalchemy
+
+from app import database
+from app.models import Usuario
+from app.utils.texto import somente_digitos
+
+__all__ = ['buscar_usuarios', 'USUARIOS_POR_PAGINA']
+
+USUARIOS_POR_PAGINA = 50
+
+_fts_disponivel = None
+
+
+def _usa_fts_sqlite():
+    """True se o banco é SQLite com a tabela FTS5 'usuario_busca' (migração 0007)."""
+    global _fts_disponivel
+    if _fts_disponivel is None:
+        engine = database.engine
+        _fts_disponivel = engine.dialect.name == 'sqlite' and \
+            sqlalchemy.inspect(engine).has_table('usuario_busca')
+    return _fts_disponivel
+
+
+def _filtro_substring(campo: str, termo: str):
+    """
+    Filtro '%termo%' que usa índice: FTS5 trigram no SQLite e GIN pg_trgm
+    no Postgres (o ILIKE abaixo já é atendido pelo índice).
+    """
+    padrao = f"%{termo}%"
+    if _usa_fts_sqlite():
+        busca = sqlalchemy.table('usuario_busca', sqlalchemy.column(campo))
+        ids = sqlalchemy.select(sqlalchemy.literal_column('rowid')) \
+            .select_from(busca).where(busca.c[campo].like(padrao))
+        return Usuario.id.in_(ids)
+    return getattr(Usuario, campo).ilike(padrao)
+
+
+def _filtro_prefixo(coluna, digitos: str):
+    """Prefixo como intervalo [digitos, próximo) para aproveitar o índice B-tree."""
+    fim = digitos[:-1] + chr(ord(digitos[-1]) + 1)
+    return sqlalchemy.and_(coluna >= digitos, coluna < fim)
+
+
+def buscar_usuarios(nome=None, email=None, cpf=None, whatsapp=None, depois_de=None, limite=USUARIOS_POR_PAGINA):
+    """
+    Busca paginada de usuários para o admin.
+
+    :param nome/email: Trecho em qualquer posição (sem diferenciar caixa).
+    :param cpf/whatsapp: Prefixo; pontuação é ignorada.
+    :param depois_de: Cursor (id do último usuário da página anterior).
+    :return: (usuarios, proximo_cursor) — proximo_cursor é None na última página.
+    """
+    query = Usuario.query
+    if nome:
+        query = query.filter(_filtro_substring('nome', nome.strip()))
+    if email:
+        query = query.filter(_filtro_substring('email', email.strip()))
+
+    for coluna, valor in ((Usuario.cpf_digitos, cpf), (Usuario.whatsapp_digitos, whatsapp)):
+        if valor:
+            digitos = somente_digitos(valor)
+            if not digitos:
+                return [], None
+            query = query.filter(_filtro_prefixo(coluna, digitos))
+
+    if depois_de:
+        query = query.filter(Usuario.id > depois_de)
+
+    usuarios = query.order_by(Usuario.id).limit(limite + 1).all()
+    proximo_cursor = None
+    if len(usuarios) > limite:
+        usuarios = usuarios[:limite]
+        proximo_cursor = usuarios[-1].id
+    return usuarios, proximo_cursor
@@ -0,0 +1,176 @@
+"""
+Cache em disco do texto extraído, endereçado pelo hash do arquivo.
+
+Cada documento vira dois arquivos em AI_EXTRACAO_CACHE_DIR (padrão
+instance/cache_extracao):
+
+- <hash>.zst: blocos de páginas comprimidos com zstd, cada bloco um frame
+  independente (o arquivo inteiro continua sendo um .zst válido);
+- <hash>.json: índice com o offset/tamanho de cada frame e o tamanho em
+  bytes de cada página, para ler um intervalo de páginas descomprimindo só
+  os blocos que o contêm.
+
+O índice é gravado por último (rename atômico), então um documento só
+aparece no cache quando está completo. O diretório é limitado por idade
+(AI_EXTRACAO_CACHE_MAX_DIAS) e tamanho (AI_EXTRACAO_CACHE_MAX_BYTES),
+descartando primeiro os documentos usados há mais tempo.
+"""
+import json
+import os
+import time
+from typing import Iterator, List
+
+import xxhash
+import zstandard
+from flask import current_app
+
+__all__ = ['hash_arquivo', 'DocumentoExtraido', 'CacheExtracao', 'get_cache_extracao']
+
+VERSAO_FORMATO = 1
+PAGINAS_POR_BLOCO = 8
+
+
+def hash_arquivo(caminho: str) -> str:
+    """xxh3-128 do conteúdo do arquivo, lido em blocos de 1 MB."""
+    h = xxhash.xxh3_128()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class DocumentoExtraido:
+    """Texto em cache de um documento; as páginas são descomprimidas sob demanda."""
+
+    def __init__(self, caminho_dados: str, indice: dict):
+        self._caminho = caminho_dados
+        self._blocos = indice['blocos']
+        self._tamanhos = indice['tamanhos']
+        self.completo = indice['completo']
+        self.tokens = indice['tokens']
+
+    @property
+    def num_paginas(self) -> int:
+        return len(self._tamanhos)
+
+    def iterar_paginas(self, inicio: int = 0, fim: int | None = None) -> Iterator[str]:
+        """Páginas [inicio, fim), descomprimindo só os blocos necessários."""
+        fim = self.num_paginas if fim is None else min(fim, self.num_paginas)
+        if inicio >= fim:
+            return
+        descompressor = zstandard.ZstdDecompressor()
+        with open(self._caminho, 'rb') as arquivo:
+            for offset, tamanho, primeira in self._blocos:
+                ultima = primeira + PAGINAS_POR_BLOCO
+                if ultima <= inicio:
+                    continue
+                if primeira >= fim:
+                    return
+                arquivo.seek(offset)
+                dados = descompressor.decompress(arquivo.read(tamanho))
+                posicao = 0
+                for pagina in range(primeira, min(ultima, self.num_paginas)):
+                    proxima = posicao + self._tamanhos[pagina]
+                    if inicio <= pagina < fim:
+                        yield dados[posicao:proxima].decode('utf-8')
+                    posicao = proxima
+
+    def paginas(self, inicio: int = 0, fim: int | None = None) -> List[str]:
+        return list(self.iterar_paginas(inicio, fim))
+
+
+class CacheExtracao:
+
+    def __init__(self, diretorio: str, max_bytes: int, max_dias: float, nivel: int = 6):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.max_idade = max_dias * 86400
+        self.nivel = nivel
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminhos(self, chave: str) -> tuple:
+        base = os.path.join(self.diretorio, chave)
+        return base + '.zst', base + '.json'
+
+    def obter(self, chave: str) -> DocumentoExtraido | None:
+        dados, indice = self._caminhos(chave)
+        try:
+            with open(indice, encoding='utf-8') as arquivo:
+                conteudo = json.load(arquivo)
+            # mtime marca o último uso (base do descarte LRU)
+            os.utime(indice)
+        except (OSError, ValueError):
+            return None
+        if conteudo.get('versao') != VERSAO_FORMATO or not os.path.exists(dados):
+            return None
+        return DocumentoExtraido(dados, conteudo)
+
+    def guardar(self, chave: str, paginas: List[str], completo: bool, tokens: int):
+        dados, indice = self._caminhos(chave)
+        sufixo = f'.{os.getpid()}.tmp'
+        compressor = zstandard.ZstdCompressor(level=self.nivel)
+        blocos = []
+        tamanhos = []
+        offset = 0
+        with open(dados + sufixo, 'wb') as arquivo:
+            for primeira in range(0, len(paginas), PAGINAS_POR_BLOCO):
+                codificadas = [p.encode('utf-8') for p in paginas[primeira:primeira + PAGINAS_POR_BLOCO]]
+                tamanhos.extend(len(p) for p in codificadas)
+                frame = compressor.compress(b''.join(codificadas))
+                arquivo.write(frame)
+                blocos.append([offset, len(frame), primeira])
+                offset += len(frame)
+        with open(indice + sufixo, 'w', encoding='utf-8') as arquivo:
+            json.dump({'versao': VERSAO_FORMATO, 'completo': completo, 'tokens': tokens,
+                       'blocos': blocos, 'tamanhos': tamanhos}, arquivo)
+        os.replace(dados + sufixo, dados)
+        os.replace(indice + sufixo, indice)
+        self.podar()
+
+    def podar(self) -> int:
+        """Remove documentos mais velhos que max_dias e, acima de max_bytes, os usados há mais tempo."""
+        documentos = {}
+        for nome in os.listdir(self.diretorio):
+            chave, extensao = os.path.splitext(nome)
+            if extensao not in ('.zst', '.json'):
+                continue
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except OSError:
+                continue
+            tamanho, usado_em = documentos.get(chave, (0, 0.0))
+            documentos[chave] = (tamanho + info.st_size, max(usado_em, info.st_mtime))
+
+        limite_idade = time.time() - self.max_idade
+        total = sum(tamanho for tamanho, _ in documentos.values())
+        removidos = 0
+        for chave, (tamanho, usado_em) in sorted(documentos.items(), key=lambda item: item[1][1]):
+            if usado_em >= limite_idade and total <= self.max_bytes:
+                break
+            for caminho in self._caminhos(chave):
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+            total -= tamanho
+            removidos += 1
+        return removidos
+
+
+_caches = {}
+
+
+def get_cache_extracao() -> CacheExtracao | None:
+    """Cache do processo, conforme a configuração; None se AI_EXTRACAO_CACHE=False."""
+    config = current_app.config if current_app else {}
+    if str(config.get('AI_EXTRACAO_CACHE', os.getenv('AI_EXTRACAO_CACHE', 'True'))) != 'True':
+        return None
+    diretorio = (config.get('AI_EXTRACAO_CACHE_DIR') or os.getenv('AI_EXTRACAO_CACHE_DIR')
+                 or os.path.join(current_app.instance_path if current_app else '.', 'cache_extracao'))
+    if diretorio not in _caches:
+        _caches[diretorio] = CacheExtracao(
+            diretorio,
+            max_bytes=int(config.get('AI_EXTRACAO_CACHE_MAX_BYTES') or os.getenv('AI_EXTRACAO_CACHE_MAX_BYTES', 1 << 30)),
+            max_dias=float(config.get('AI_EXTRACAO_CACHE_MAX_DIAS') or os.getenv('AI_EXTRACAO_CACHE_MAX_DIAS', 30)),
+        )
+    return _caches[diretorio]
@@ -0,0 +1,139 @@
+"""
+Cache de resultados de IA endereçado por conteúdo.
+
+O texto extraído é normalizado e hasheado (xxh3-128); a chave inclui a
+versão dos prompts e o modelo, então mudar qualquer um dos dois invalida o
+cache naturalmente. O tamanho total é limitado por AI_RESULT_CACHE_MAX_BYTES,
+descartando as entradas menos acessadas recentemente.
+
+Nenhuma função daqui faz commit da sessão do chamador: process_study_material
+grava o resultado, o cache e a limpeza dos checkpoints numa única transação
+(clonar_para_estudo). Os contadores de acesso de buscar_resultado são
+gravados numa transação própria quando a do chamador termina, então valem
+mesmo se o processamento falhar depois.
+"""
+import json
+import unicodedata
+
+import xxhash
+from flask import current_app
+from sqlalchemy import func, update
+
+from app import database
+from app.db_engine import apos_transacao
+from app.models import Metrica, ResultadoIACache, now_brazil
+from app.services.checkpoints import limpar_checkpoints
+from app.services.metricas import incrementar
+
+__all__ = [
+    'normalizar_texto', 'hash_conteudo', 'buscar_resultado', 'guardar_resultado',
+    'clonar_para_estudo', 'estatisticas_cache',
+]
+
+
+def normalizar_texto(texto: str) -> str:
+    """NFC + espaços colapsados: diferenças de quebra de linha não mudam o hash."""
+    return ' '.join(unicodedata.normalize('NFC', texto).split())
+
+
+def hash_conteudo(texto: str) -> str:
+    return xxhash.xxh3_128_hexdigest(normalizar_texto(texto).encode('utf-8'))
+
+
+def _chave(texto_hash: str, versao_prompt: str, modelo: str) -> str:
+    return f"{texto_hash}:{versao_prompt}:{modelo}"
+
+
+def buscar_resultado(texto_hash: str, versao_prompt: str, modelo: str) -> dict | None:
+    """
+    Retorna {'resumo', 'qcm_json'} em cache, ou None. Hit/miss e o acesso à
+    entrada são gravados à parte, ao fim da transação do chamador.
+    """
+    chave = _chave(texto_hash, versao_prompt, modelo)
+    entrada = database.session.get(ResultadoIACache, chave)
+    acessado_em = now_brazil()
+
+    def contar():
+        with database.engine.begin() as conn:
+            if entrada is None:
+                incrementar({'cache_ia:misses': 1}, conn=conn)
+                return
+            tabela = ResultadoIACache.__table__
+            conn.execute(update(tabela).where(tabela.c.chave == chave)
+                         .values(acessos=tabela.c.acessos + 1, acessado_em=acessado_em))
+            incrementar({'cache_ia:hits': 1}, conn=conn)
+
+    apos_transacao(database.session(), contar)
+    if entrada is None:
+        return None
+    return {'resumo': entrada.resumo, 'qcm_json': entrada.qcm_json}
+
+
+def guardar_resultado(texto_hash: str, versao_prompt: str, modelo: str, resumo: str, qcm_json: dict):
+    """Grava um resultado e aplica o limite de tamanho do cache (o chamador faz o commit)."""
+    tamanho = len(resumo.encode('utf-8')) + len(json.dumps(qcm_json, ensure_ascii=False).encode('utf-8'))
+    database.session.merge(ResultadoIACache(
+        chave=_chave(texto_hash, versao_prompt, modelo),
+        texto_hash=texto_hash,
+        versao_prompt=versao_prompt,
+        modelo=modelo,
+        resumo=resumo,
+        qcm_json=qcm_json,
+        tamanho_bytes=tamanho,
+        acessado_em=now_brazil(),
+    ))
+    database.session.flush()
+    _aplicar_limite(int(current_app.config.get('AI_RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024)))
+
+
+def _aplicar_limite(max_bytes: int):
+    """Remove as entradas acessadas há mais tempo até o total caber em max_bytes."""
+    total = database.session.query(func.coalesce(func.sum(ResultadoIACache.tamanho_bytes), 0)).scalar()
+    if total <= max_bytes:
+        return
+
+    excesso = total - max_bytes
+    remover = []
+    for chave, tamanho in database.session.query(ResultadoIACache.chave, ResultadoIACache.tamanho_bytes) \
+            .order_by(ResultadoIACache.acessado_em).yield_per(500):
+        if excesso <= 0:
+            break
+        remover.append(chave)
+        excesso -= tamanho
+
+    database.session.query(ResultadoIACache).filter(ResultadoIACache.chave.in_(remover)) \
+        .delete(synchronize_session=False)
+    incrementar({'cache_ia:evictions': len(remover)})
+
+
+def clonar_para_estudo(estudo, resultado: dict):
+    """
+    Copia resumo e questões de um resultado (do cache ou recém-gerado) para o
+    Estudo, marca-o como pronto, apaga os checkpoints e faz o commit.
+    """
+    estudo.resumo = resultado['resumo']
+    estudo.registrar_questoes(resultado['qcm_json'].get('questoes', []))
+    estudo.status = 'pronto'
+    limpar_checkpoints(estudo.id)
+    database.session.commit()
+
+
+def estatisticas_cache() -> dict:
+    """Hits, misses, evictions, taxa de acerto, nº de entradas e bytes ocupados."""
+    contadores = dict(
+        database.session.query(Metrica.chave, Metrica.valor).filter(Metrica.chave.like('cache_ia:%')).all()
+    )
+    hits = contadores.get('cache_ia:hits', 0)
+    misses = contadores.get('cache_ia:misses', 0)
+    entradas, ocupado = database.session.query(
+        func.count(ResultadoIACache.chave), func.coalesce(func.sum(ResultadoIACache.tamanho_bytes), 0)
+    ).one()
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        'evictions': contadores.get('cache_ia:evictions', 0),
+        'entradas': entradas,
+        'bytes': ocupado,
+        'max_bytes': int(current_app.config.get('AI_RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+    }
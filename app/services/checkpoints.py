@@ -0,0 +1,102 @@
+"""
+Checkpoints das etapas do pipeline de IA.
+
+Com um estudo_id, cada etapa de process_study_material (resumo, questões
+brutas, questões validadas...) grava sua saída em 'checkpoints_estudo' ao
+terminar, junto com a versão do pipeline (prompts, topologia, seleção de
+trechos, extração). Numa nova tentativa do mesmo estudo as etapas gravadas
+na mesma versão são restauradas em vez de refeitas; as de outra versão são
+ignoradas e sobrescritas.
+
+A extração não guarda o texto: o checkpoint 'extracao' só referencia a
+entrada do cache de extração (a chave já identifica o arquivo e a versão do
+extrator, então vale para qualquer versão do pipeline).
+
+Os checkpoints são apagados quando o resultado é gravado no Estudo
+(clonar_para_estudo); os de tentativas abandonadas, por
+limpar_checkpoints_antigos ('flask agendador').
+"""
+from datetime import timedelta
+
+from app import database
+from app.models import CheckpointEstudo, now_brazil
+
+__all__ = ['Checkpoints', 'possui_checkpoint', 'limpar_checkpoints', 'limpar_checkpoints_antigos']
+
+
+class Checkpoints:
+    """Checkpoints de um estudo numa versão do pipeline; sem estudo_id, só executa as etapas."""
+
+    def __init__(self, estudo_id: int | None = None, versao: str | None = None):
+        self.estudo_id = estudo_id
+        self.versao = versao
+        self.restaurados = []
+        self._salvos = {}
+        if estudo_id is not None:
+            self._salvos = {
+                etapa: dados
+                for etapa, dados, versao_salva in database.session.query(
+                    CheckpointEstudo.etapa, CheckpointEstudo.dados, CheckpointEstudo.versao
+                ).filter(CheckpointEstudo.estudo_id == estudo_id)
+                # versao NULL: etapa independente da versão do pipeline (ex.: a referência da extração)
+                if versao_salva is None or versao_salva == versao
+            }
+
+    @property
+    def etapas(self) -> list:
+        return sorted(self._salvos)
+
+    def obter(self, etapa: str):
+        """Saída gravada da etapa nesta versão, ou None."""
+        return self._salvos.get(etapa)
+
+    def gravar(self, etapa: str, dados, versionado: bool = True):
+        """Grava a saída da etapa (JSON); versionado=False vale para qualquer versão do pipeline."""
+        if self.estudo_id is not None:
+            database.session.merge(CheckpointEstudo(
+                estudo_id=self.estudo_id, etapa=etapa, dados=dados, versao=self.versao if versionado else None,
+                criado_em=now_brazil(),
+            ))
+            database.session.commit()
+        self._salvos[etapa] = dados
+
+    def executar(self, etapa: str, funcao, *args):
+        """Retorna a saída gravada da etapa ou executa funcao(*args) e grava o resultado (JSON)."""
+        if etapa in self._salvos:
+            self.restaurados.append(etapa)
+            return self._salvos[etapa]
+
+        dados = funcao(*args)
+        self.gravar(etapa, dados)
+        return dados
+
+
+def possui_checkpoint(estudo_id: int, etapa: str) -> bool:
+    """
+    Permite ao worker pular o download do arquivo quando a extração já foi
+    gravada; para 'extracao', confere também que o texto continua no cache
+    de extração.
+    """
+    dados = database.session.query(CheckpointEstudo.dados) \
+        .filter(CheckpointEstudo.estudo_id == estudo_id, CheckpointEstudo.etapa == etapa).scalar()
+    if dados is None:
+        return False
+    if etapa == 'extracao':
+        from app.services.extracao import em_cache
+        return isinstance(dados, dict) and em_cache(dados.get('chave'))
+    return True
+
+
+def limpar_checkpoints(estudo_id: int):
+    """Remove os checkpoints do estudo (o chamador faz o commit)."""
+    database.session.query(CheckpointEstudo).filter(CheckpointEstudo.estudo_id == estudo_id) \
+        .delete(synchronize_session=False)
+
+
+def limpar_checkpoints_antigos(dias: int) -> int:
+    """Remove checkpoints de tentativas abandonadas há mais de 'dias' dias."""
+    removidos = database.session.query(CheckpointEstudo) \
+        .filter(CheckpointEstudo.criado_em < now_brazil() - timedelta(days=dias)) \
+        .delete(synchronize_session=False)
+    database.session.commit()
+    return removidos
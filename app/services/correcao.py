@@ -0,0 +1,58 @@
+from sqlalchemy import update
+
+from app import database
+from app.models import Questao, now_brazil
+from app.services.metricas import registrar_correcao
+from app.utils.texto import normalizar_resposta
+
+__all__ = ['corrigir_respostas']
+
+
+def corrigir_respostas(estudo, respostas: dict) -> dict:
+    """
+    Corrige as respostas de um estudo em lote e atualiza seus agregados.
+
+    :param estudo: Estudo a corrigir.
+    :param respostas: {questao_id: resposta_enviada}; ids de outros estudos são ignorados.
+    :return: Dicionário com 'acertos', 'total', 'aproveitamento' e 'questoes'
+             ({id, resposta_usuario, correta} de cada questão).
+    """
+    linhas = database.session.execute(
+        database.select(
+            Questao.id, Questao.resposta_chave, Questao.resposta_correta,
+            Questao.resposta_usuario, Questao.correta
+        ).where(Questao.estudo_id == estudo.id).order_by(Questao.id)
+    ).all()
+
+    atualizacoes = []
+    questoes = []
+    for questao_id, chave, resposta_correta, resposta_usuario, correta in linhas:
+        enviada = respostas.get(questao_id)
+        if enviada:
+            chave = chave or normalizar_resposta(resposta_correta)
+            resposta_usuario = enviada
+            correta = normalizar_resposta(enviada) == chave
+            atualizacoes.append({'id': questao_id, 'resposta_usuario': resposta_usuario, 'correta': correta})
+        questoes.append({'id': questao_id, 'resposta_usuario': resposta_usuario, 'correta': bool(correta)})
+
+    if atualizacoes:
+        # UPDATE em lote por chave primária (executemany)
+        database.session.execute(update(Questao), atualizacoes)
+
+    respondido_antes, nota_antes = estudo.foi_respondido, estudo.aproveitamento
+
+    acertos = sum(1 for q in questoes if q['correta'])
+    estudo.questoes_total = len(questoes)
+    estudo.questoes_acertos = acertos
+    estudo.respondido = any(q['resposta_usuario'] is not None for q in questoes)
+    estudo.corrigido_em = now_brazil()
+    if atualizacoes and estudo.status == 'pronto':
+        registrar_correcao(respondido_antes, nota_antes, estudo.aproveitamento)
+    database.session.commit()
+
+    return {
+        'acertos': acertos,
+        'total': len(questoes),
+        'aproveitamento': estudo.aproveitamento,
+        'questoes': questoes,
+    }
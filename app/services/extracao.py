@@ -0,0 +1,263 @@
+"""
+Extração de texto dos documentos enviados.
+
+As páginas são lidas sob demanda (gerador) e a leitura para assim que o
+orçamento de tokens (AI_EXTRACAO_MAX_TOKENS) é atingido, então um livro de
+500 páginas não precisa ser inteiro carregado nem convertido em Documents.
+PDFs grandes (a partir de AI_EXTRACAO_PAGINAS_POOL páginas) são extraídos em
+blocos de páginas num pool de processos, já que o parsing é CPU-bound. O
+texto extraído fica em cache pelo hash do arquivo (services/cache_extracao).
+
+Cada formato é um gerador de páginas registrado com @registrar_extrator; as
+extensões aceitas no upload (extensoes_suportadas) vêm do mesmo registro.
+pypdf e python-docx só são importados ao extrair, então o processo web pode
+importar este módulo.
+"""
+import codecs
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List
+
+from flask import current_app
+
+from app.services.cache_extracao import get_cache_extracao, hash_arquivo
+from app.services.orcamento_tokens import estimar_tokens
+
+__all__ = [
+    'registrar_extrator', 'extensoes_suportadas', 'iterar_paginas', 'extrair_texto', 'extrair_com_chave',
+    'chave_extracao', 'em_cache', 'texto_em_cache',
+]
+
+# Incrementar ao mudar a forma de extrair: invalida o cache de extração.
+VERSAO_EXTRACAO = "2"
+
+# Tamanho das "páginas" de formatos sem paginação (TXT, DOCX)
+TAMANHO_BLOCO = 65536
+
+EXTRATORES: Dict[str, Callable[[str], Iterator[str]]] = {}
+
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+
+
+def _cfg_int(key: str, default: int) -> int:
+    return int((current_app.config.get(key) if current_app else None) or os.getenv(key, default))
+
+
+def registrar_extrator(*extensoes: str):
+    """Decorador: registra um gerador de páginas (caminho -> Iterator[str]) para as extensões."""
+    def registrar(funcao):
+        for extensao in extensoes:
+            EXTRATORES[extensao.lower().lstrip('.')] = funcao
+        return funcao
+    return registrar
+
+
+def extensoes_suportadas() -> set:
+    return set(EXTRATORES)
+
+
+def _get_pool(processos: int) -> ProcessPoolExecutor:
+    """Pool de processos do worker, criado na primeira vez e recriado após fork."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(max_workers=processos)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _texto_pagina(pagina) -> str:
+    # Mesmo modo de extração do PyPDFLoader
+    return pagina.extract_text(extraction_mode="plain") or ""
+
+
+def _extrair_intervalo(caminho: str, inicio: int, fim: int) -> List[str]:
+    """Executado nos processos do pool: texto das páginas [inicio, fim)."""
+    from pypdf import PdfReader
+    leitor = PdfReader(caminho)
+    return [_texto_pagina(leitor.pages[i]) for i in range(inicio, fim)]
+
+
+@registrar_extrator('pdf')
+def _paginas_pdf(caminho: str) -> Iterator[str]:
+    from pypdf import PdfReader
+    leitor = PdfReader(caminho)
+    total = len(leitor.pages)
+    processos = _cfg_int('AI_EXTRACAO_PROCESSOS', os.cpu_count() or 1)
+
+    if processos <= 1 or total < _cfg_int('AI_EXTRACAO_PAGINAS_POOL', 40):
+        for pagina in leitor.pages:
+            yield _texto_pagina(pagina)
+        return
+
+    del leitor
+    bloco = _cfg_int('AI_EXTRACAO_PAGINAS_BLOCO', 16)
+    pool = _get_pool(processos)
+    intervalos = [(i, min(i + bloco, total)) for i in range(0, total, bloco)]
+    # No máximo 2 blocos por processo em andamento: parar cedo não desperdiça o resto do arquivo
+    pendentes = []
+    proximo = 0
+    try:
+        while proximo < len(intervalos) or pendentes:
+            while proximo < len(intervalos) and len(pendentes) < 2 * processos:
+                pendentes.append(pool.submit(_extrair_intervalo, caminho, *intervalos[proximo]))
+                proximo += 1
+            yield from pendentes.pop(0).result()
+    finally:
+        for futuro in pendentes:
+            futuro.cancel()
+
+
+def _agrupar(textos: Iterator[str], separador: str = "\n") -> Iterator[str]:
+    """Junta textos curtos (parágrafos, linhas de tabela) em blocos de ~TAMANHO_BLOCO caracteres."""
+    bloco = []
+    tamanho = 0
+    for texto in textos:
+        bloco.append(texto)
+        tamanho += len(texto) + 1
+        if tamanho >= TAMANHO_BLOCO:
+            yield separador.join(bloco)
+            bloco = []
+            tamanho = 0
+    if bloco:
+        yield separador.join(bloco)
+
+
+def _textos_docx(conteiner) -> Iterator[str]:
+    """Parágrafos e tabelas na ordem do documento; cada linha de tabela vira 'c1 | c2 | ...'."""
+    for item in conteiner.iter_inner_content():
+        if hasattr(item, 'rows'):
+            for linha in item.rows:
+                celulas = []
+                for celula in linha.cells:
+                    # Células mescladas se repetem em row.cells
+                    texto = "\n".join(_textos_docx(celula)).strip()
+                    if texto and (not celulas or celulas[-1] != texto):
+                        celulas.append(texto)
+                if celulas:
+                    yield " | ".join(celulas)
+        elif item.text.strip():
+            yield item.text
+
+
+@registrar_extrator('docx')
+def _paginas_docx(caminho: str) -> Iterator[str]:
+    import docx
+    yield from _agrupar(_textos_docx(docx.Document(caminho)))
+
+
+def _detectar_codificacao(amostra: bytes) -> str:
+    """BOM, depois UTF-8 (o caso comum), depois charset_normalizer; cp1252 em empate ou último caso."""
+    for bom, codificacao in ((codecs.BOM_UTF8, 'utf-8-sig'),
+                             (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+                             (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')):
+        if amostra.startswith(bom):
+            return codificacao
+    try:
+        # final=False: a amostra pode cortar um caractere multibyte no fim
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    from charset_normalizer import from_bytes
+    candidatos = from_bytes(amostra)
+    melhor = candidatos.best()
+    if melhor is None:
+        return 'cp1252'
+    # Empates são comuns (cp1250/cp1252/cp1257 leem igual quase todo texto latino);
+    # cp1252 é o padrão do Windows em português e o único que acerta 'ã' e 'õ'
+    for candidato in candidatos:
+        if candidato.encoding == 'cp1252' and candidato.chaos <= melhor.chaos:
+            return 'cp1252'
+    return melhor.encoding
+
+
+@registrar_extrator('txt')
+def _paginas_txt(caminho: str) -> Iterator[str]:
+    with open(caminho, 'rb') as arquivo:
+        codificacao = _detectar_codificacao(arquivo.read(TAMANHO_BLOCO))
+    # Blocos de ~64 KB cortados em fim de linha
+    with open(caminho, encoding=codificacao, errors='replace') as arquivo:
+        while True:
+            bloco = arquivo.read(TAMANHO_BLOCO)
+            if not bloco:
+                return
+            yield bloco + arquivo.readline()
+
+
+def iterar_paginas(file_path: str) -> Iterator[str]:
+    """Gera o texto do documento página a página (ou em blocos, para TXT/DOCX)."""
+    file_extension = os.path.splitext(file_path)[1].lower()
+    extrator = EXTRATORES.get(file_extension.lstrip('.'))
+    if extrator is None:
+        raise ValueError(f"Extensão de arquivo não suportada: {file_extension}")
+    return extrator(file_path)
+
+
+def _ler_ate_limite(paginas: Iterator[str], limite: int) -> tuple:
+    """(páginas lidas, tokens estimados, se o documento foi lido até o fim)."""
+    lidas = []
+    tokens = 0
+    try:
+        for texto in paginas:
+            lidas.append(texto)
+            tokens += estimar_tokens(texto)
+            if tokens >= limite:
+                return lidas, tokens, next(paginas, None) is None
+        return lidas, tokens, True
+    finally:
+        paginas.close()
+
+
+def chave_extracao(file_path: str) -> str:
+    """Chave do documento no cache de extração: hash do arquivo e VERSAO_EXTRACAO."""
+    return f"{hash_arquivo(file_path)}-{VERSAO_EXTRACAO}"
+
+
+def em_cache(chave: str | None) -> bool:
+    """Se o cache de extração (ligado) tem o documento da chave."""
+    cache = get_cache_extracao()
+    return bool(chave) and cache is not None and cache.obter(chave) is not None
+
+
+def texto_em_cache(chave: str, max_tokens: int | None = None) -> str | None:
+    """Texto do documento em cache, se ele estiver lá e cobrir max_tokens; senão None."""
+    limite = max_tokens or _cfg_int('AI_EXTRACAO_MAX_TOKENS', 250000)
+    cache = get_cache_extracao()
+    documento = cache.obter(chave) if cache is not None else None
+    # Serve se cobre o orçamento pedido (foi lido até o fim ou além do limite)
+    if documento is None or not (documento.completo or documento.tokens >= limite):
+        return None
+    paginas, _, _ = _ler_ate_limite(documento.iterar_paginas(), limite)
+    return "\n\n".join(paginas)
+
+
+def extrair_com_chave(file_path: str, max_tokens: int | None = None) -> tuple:
+    """
+    (texto, chave no cache de extração) do documento, parando na página em
+    que o total estimado passa de max_tokens (padrão AI_EXTRACAO_MAX_TOKENS).
+    Um documento já visto sai do cache sem ser reprocessado. A chave é None
+    com o cache desligado (AI_EXTRACAO_CACHE=False).
+    """
+    limite = max_tokens or _cfg_int('AI_EXTRACAO_MAX_TOKENS', 250000)
+    cache = get_cache_extracao()
+    if cache is None:
+        paginas, _, _ = _ler_ate_limite(iterar_paginas(file_path), limite)
+        return "\n\n".join(paginas), None
+
+    chave = chave_extracao(file_path)
+    texto = texto_em_cache(chave, limite)
+    if texto is None:
+        paginas, tokens, completo = _ler_ate_limite(iterar_paginas(file_path), limite)
+        cache.guardar(chave, paginas, completo, tokens)
+        texto = "\n\n".join(paginas)
+    return texto, chave
+
+
+def extrair_texto(file_path: str, max_tokens: int | None = None) -> str:
+    """Texto do documento (ver extrair_com_chave)."""
+    return extrair_com_chave(file_path, max_tokens)[0]
@@ -0,0 +1,74 @@
+from io import BytesIO
+
+import xxhash
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.integrations.storage import get_storage
+
+# Lado máximo (px) de cada variante gerada
+TAMANHOS_FOTO = {'p': 64, 'm': 256, 'g': 512}
+MAX_BYTES_FOTO = 5 * 1024 * 1024
+
+
+def chave_foto(usuario_id: int, versao: str, tamanho: str) -> str:
+    return f"{usuario_id}/{versao}_{tamanho}.webp"
+
+
+def gerar_variantes(dados: bytes) -> dict:
+    """Gera as variantes WebP de uma imagem. Levanta ValueError se não for imagem."""
+    try:
+        imagem = Image.open(BytesIO(dados))
+        imagem = ImageOps.exif_transpose(imagem)
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"Arquivo de imagem inválido: {e}")
+
+    imagem = imagem.convert('RGBA' if imagem.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    variantes = {}
+    for tamanho, lado in TAMANHOS_FOTO.items():
+        copia = imagem.copy()
+        copia.thumbnail((lado, lado), Image.LANCZOS)
+        saida = BytesIO()
+        copia.save(saida, format='WEBP', quality=82, method=4)
+        variantes[tamanho] = saida.getvalue()
+    return variantes
+
+
+def salvar_foto_perfil(usuario, dados: bytes) -> str | None:
+    """
+    Grava as variantes da foto no storage e aponta usuario.foto_versao para
+    elas. Não faz commit: retorna a versão anterior, que o chamador remove
+    com remover_versao_foto() só depois do commit (se o commit falhar, o
+    usuário continua apontando para arquivos que ainda existem).
+    """
+    if not dados:
+        raise ValueError("Arquivo de imagem vazio.")
+    if len(dados) > MAX_BYTES_FOTO:
+        raise ValueError("A imagem deve ter no máximo 5MB.")
+
+    variantes = gerar_variantes(dados)
+    versao = xxhash.xxh64_hexdigest(dados)
+    storage = get_storage('FOTOS')
+
+    for tamanho, conteudo in variantes.items():
+        storage.salvar(chave_foto(usuario.id, versao, tamanho), conteudo, 'image/webp')
+
+    anterior = usuario.foto_versao
+    usuario.foto_versao = versao
+    usuario.foto_perfil = None
+    return anterior if anterior != versao else None
+
+
+def remover_versao_foto(usuario_id: int, versao: str | None):
+    """Remove as variantes de uma versão da foto (no-op se versao for None)."""
+    if not versao:
+        return
+    storage = get_storage('FOTOS')
+    for tamanho in TAMANHOS_FOTO:
+        storage.remover(chave_foto(usuario_id, versao, tamanho))
+
+
+def ler_foto_perfil(usuario_id: int, versao: str, tamanho: str) -> bytes | None:
+    if tamanho not in TAMANHOS_FOTO:
+        return None
+    return get_storage('FOTOS').ler(chave_foto(usuario_id, versao, tamanho))
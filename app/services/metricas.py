@@ -0,0 +1,154 @@
+"""
+Métricas da plataforma mantidas incrementalmente pelos caminhos de escrita.
+
+Os incrementos rodam na mesma transação da escrita que os origina (o
+chamador faz o commit). As transições de Estudo.status são contadas por um
+evento do ORM (models._estudo_atualizado), em qualquer processo que use os
+modelos. reconciliar_metricas() recalcula os totais a partir das tabelas de
+origem e corrige qualquer desvio; 'flask agendador' a executa periodicamente.
+"""
+from datetime import timedelta
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import database
+from app.models import Metrica, MetricaDiaria, Usuario, Estudo, now_brazil
+
+__all__ = [
+    'registrar_cadastro', 'registrar_exclusao_usuario', 'registrar_estudo_criado',
+    'registrar_transicao_status', 'registrar_correcao', 'ler_metricas', 'reconciliar_metricas',
+]
+
+DIAS_ATIVIDADE = 14
+
+
+def _insert(conn, tabela):
+    return (postgresql if conn.dialect.name == 'postgresql' else sqlite).insert(tabela)
+
+
+def _incrementar(conn, tabela, delta, **chaves):
+    stmt = _insert(conn, tabela).values(valor=delta, **chaves)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(chaves),
+        set_={'valor': tabela.c.valor + stmt.excluded.valor}
+    )
+    conn.execute(stmt)
+
+
+def incrementar(deltas: dict, diarios: dict | None = None, conn=None):
+    """
+    Aplica {chave: delta} em 'metricas' e, opcionalmente, em 'metricas_diarias'
+    (hoje), na conexão informada ou na da sessão.
+    """
+    conn = conn if conn is not None else database.session.connection()
+    for chave, delta in deltas.items():
+        if delta:
+            _incrementar(conn, Metrica.__table__, delta, chave=chave)
+    hoje = now_brazil().date()
+    for chave, delta in (diarios or {}).items():
+        if delta:
+            _incrementar(conn, MetricaDiaria.__table__, delta, dia=hoje, chave=chave)
+
+
+def registrar_cadastro():
+    incrementar({'usuarios': 1}, {'cadastros': 1})
+
+
+def registrar_exclusao_usuario():
+    incrementar({'usuarios': -1})
+
+
+def registrar_estudo_criado(status: str):
+    incrementar({'estudos': 1, f'estudos_status:{status}': 1}, {'estudos_criados': 1})
+
+
+def registrar_transicao_status(de: str, para: str, conn=None):
+    """Chamado pelo evento de Estudo.status (ex.: processando -> pronto/erro)."""
+    if de != para:
+        incrementar({f'estudos_status:{de}': -1, f'estudos_status:{para}': 1}, conn=conn)
+
+
+def registrar_correcao(respondido_antes: bool, nota_antes: int, nota_depois: int):
+    """Mantém a soma das notas dos estudos respondidos, base da média geral."""
+    incrementar(
+        {
+            'estudos_respondidos': 0 if respondido_antes else 1,
+            'soma_aproveitamento': nota_depois - (nota_antes if respondido_antes else 0),
+        },
+        {'correcoes': 1}
+    )
+
+
+def ler_metricas() -> dict:
+    """Lê os contadores pré-calculados (duas consultas em tabelas pequenas)."""
+    valores = dict(database.session.query(Metrica.chave, Metrica.valor).all())
+
+    por_status = {
+        chave.split(':', 1)[1]: valor
+        for chave, valor in valores.items() if chave.startswith('estudos_status:')
+    }
+    respondidos = valores.get('estudos_respondidos', 0)
+
+    inicio = now_brazil().date() - timedelta(days=DIAS_ATIVIDADE - 1)
+    atividade = {}
+    for dia, chave, valor in database.session.query(MetricaDiaria.dia, MetricaDiaria.chave, MetricaDiaria.valor) \
+            .filter(MetricaDiaria.dia >= inicio).order_by(MetricaDiaria.dia):
+        atividade.setdefault(dia, {})[chave] = valor
+
+    return {
+        'usuarios': valores.get('usuarios', 0),
+        'estudos': valores.get('estudos', 0),
+        'estudos_por_status': por_status,
+        'fila_processamento': por_status.get('processando', 0),
+        'estudos_respondidos': respondidos,
+        'score_medio': int(valores.get('soma_aproveitamento', 0) / respondidos) if respondidos else 0,
+        'atividade_diaria': atividade,
+    }
+
+
+def reconciliar_metricas(conn) -> dict:
+    """
+    Recalcula os totais a partir de 'usuario' e 'estudos' e sobrescreve essas
+    chaves em 'metricas' (status sem estudos voltam a zero). Contadores que
+    não vêm dessas tabelas, como os cache_ia:*, ficam como estão.
+    Retorna {chave: (antes, depois)} para as chaves que desviaram.
+    """
+    usuario, estudos = Usuario.__table__, Estudo.__table__
+    nota = sqlalchemy.case(
+        (estudos.c.questoes_total > 0, estudos.c.questoes_acertos * 100 // estudos.c.questoes_total),
+        else_=0
+    )
+
+    reais = {
+        'usuarios': conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(usuario)).scalar(),
+        'estudos': 0,
+        'estudos_respondidos': 0,
+        'soma_aproveitamento': 0,
+    }
+    linhas = conn.execute(
+        sqlalchemy.select(estudos.c.status, estudos.c.respondido, sqlalchemy.func.count(),
+                          sqlalchemy.func.coalesce(sqlalchemy.func.sum(nota), 0))
+        .group_by(estudos.c.status, estudos.c.respondido)
+    ).all()
+    for status, respondido, quantidade, notas in linhas:
+        reais['estudos'] += quantidade
+        chave = f'estudos_status:{status}'
+        reais[chave] = reais.get(chave, 0) + quantidade
+        if respondido and status == 'pronto':
+            reais['estudos_respondidos'] += quantidade
+            reais['soma_aproveitamento'] += notas
+
+    tabela = Metrica.__table__
+    atuais = dict(conn.execute(sqlalchemy.select(tabela.c.chave, tabela.c.valor)).all())
+    for chave in atuais:
+        if chave.startswith('estudos_status:'):
+            reais.setdefault(chave, 0)
+
+    desvios = {}
+    for chave, valor in reais.items():
+        if atuais.get(chave) != valor:
+            desvios[chave] = (atuais.get(chave), valor)
+            stmt = _insert(conn, tabela).values(chave=chave, valor=valor)
+            conn.execute(stmt.on_conflict_do_update(index_elements=['chave'], set_={'valor': valor}))
+    return desvios
@@ -0,0 +1,119 @@
+"""
+Orçamento de tokens do pipeline de IA.
+
+Cada etapa (map, reduce, resumo, qcm, consistencia, reparo) tem seu perfil de
+modelo, max_tokens e temperatura, sobrescrevível por AI_<ETAPA>_MODEL,
+AI_<ETAPA>_MAX_TOKENS e AI_<ETAPA>_TEMPERATURE. O tamanho dos trechos é o
+que cabe no contexto do modelo depois de descontar o template do prompt, as
+instruções de formato e a resposta.
+
+O tokenizer do DeepSeek não é distribuído em Python, então os tokens são
+estimados por uma razão caracteres/token calibrada com o 'usage' que a API
+devolve em cada chamada.
+"""
+import os
+import threading
+from dataclasses import dataclass
+
+from flask import current_app
+
+__all__ = ['PerfilEtapa', 'perfil', 'estimar_tokens', 'tamanho_trecho', 'calibrar', 'resumir_uso']
+
+# Janela de contexto (tokens) por modelo; AI_CONTEXTO_TOKENS sobrepõe.
+CONTEXTO_MODELOS = {
+    'deepseek-chat': 65536,
+    'deepseek-reasoner': 65536,
+}
+
+
+@dataclass(frozen=True)
+class PerfilEtapa:
+    model: str
+    max_tokens: int
+    temperature: float
+
+
+PERFIS_PADRAO = {
+    # ~200 palavras por trecho
+    'map': PerfilEtapa('deepseek-chat', 500, 0.3),
+    # ~300 palavras
+    'reduce': PerfilEtapa('deepseek-chat', 800, 0.3),
+    'resumo': PerfilEtapa('deepseek-chat', 800, 0.3),
+    # 5 questões com 4 opções em JSON
+    'qcm': PerfilEtapa('deepseek-chat', 1500, 0.5),
+    'consistencia': PerfilEtapa('deepseek-chat', 1500, 0.2),
+    # Só corrige a estrutura do JSON
+    'reparo': PerfilEtapa('deepseek-chat', 1500, 0.0),
+}
+
+
+def _cfg(key: str):
+    valor = current_app.config.get(key) if current_app else None
+    return valor if valor is not None else os.getenv(key)
+
+
+def perfil(etapa: str) -> PerfilEtapa:
+    padrao = PERFIS_PADRAO[etapa]
+    prefixo = f'AI_{etapa.upper()}_'
+    model = _cfg(prefixo + 'MODEL')
+    max_tokens = _cfg(prefixo + 'MAX_TOKENS')
+    temperature = _cfg(prefixo + 'TEMPERATURE')
+    return PerfilEtapa(
+        model=model or padrao.model,
+        max_tokens=int(max_tokens) if max_tokens is not None else padrao.max_tokens,
+        temperature=float(temperature) if temperature is not None else padrao.temperature,
+    )
+
+
+class _Estimador:
+    """Razão caracteres/token ajustada por média móvel exponencial."""
+
+    def __init__(self, razao: float, peso: float = 0.2):
+        self.razao = razao
+        self.peso = peso
+        self._lock = threading.Lock()
+
+    def estimar(self, texto: str) -> int:
+        return int(len(texto) / self.razao) + 1
+
+    def calibrar(self, caracteres: int, tokens: int):
+        with self._lock:
+            self.razao += self.peso * (caracteres / tokens - self.razao)
+
+
+_estimador = _Estimador(float(os.getenv('AI_CHARS_POR_TOKEN', 3.5)))
+
+
+def estimar_tokens(texto: str) -> int:
+    return _estimador.estimar(texto)
+
+
+def calibrar(uso: list):
+    """Ajusta a razão caracteres/token com os registros de DeepSeekLLM.uso."""
+    for registro in uso:
+        if registro.get('prompt_tokens') and registro.get('caracteres_prompt'):
+            _estimador.calibrar(registro['caracteres_prompt'], registro['prompt_tokens'])
+
+
+def tamanho_trecho(template: str, etapa: str, instrucoes: str = "") -> int:
+    """
+    Maior trecho (em caracteres) que cabe num prompt da etapa: contexto do
+    modelo menos template, instruções de formato, resposta (max_tokens) e
+    uma margem de 5%, limitado a AI_TRECHO_MAX_TOKENS.
+    """
+    p = perfil(etapa)
+    contexto = int(_cfg('AI_CONTEXTO_TOKENS') or CONTEXTO_MODELOS.get(p.model, 32768))
+    disponivel = contexto - estimar_tokens(template + instrucoes) - p.max_tokens - contexto // 20
+    teto = int(_cfg('AI_TRECHO_MAX_TOKENS') or 6000)
+    return int(max(256, min(disponivel, teto)) * _estimador.razao)
+
+
+def resumir_uso(uso: list) -> dict:
+    """Totais por etapa: {'map': {'chamadas', 'prompt_tokens', 'completion_tokens'}, ...}."""
+    totais = {}
+    for registro in uso:
+        etapa = totais.setdefault(registro.get('etapa') or '-', {'chamadas': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        etapa['chamadas'] += 1
+        etapa['prompt_tokens'] += registro.get('prompt_tokens') or 0
+        etapa['completion_tokens'] += registro.get('completion_tokens') or 0
+    return totais
@@ -0,0 +1,52 @@
+"""
+Resumo parcial publicado durante o processamento.
+
+O worker passa um PublicadorResumo como ao_progresso de
+process_study_material(); o texto parcial vai para estudos.resumo enquanto o
+estudo está 'processando', e a página do estudo o consulta em
+/estudo/<id>/resumo/parcial. concluir() é chamado quando o resumo termina.
+"""
+import time
+
+from flask import current_app
+
+from app import database
+from app.models import Estudo
+
+__all__ = ['PublicadorResumo']
+
+
+class PublicadorResumo:
+    """
+    Callback que grava o resumo parcial no Estudo, no máximo uma vez a cada
+    AI_STREAM_FLUSH_SECONDS (cada gravação é um UPDATE + commit curto).
+    """
+
+    def __init__(self, estudo_id: int, intervalo: float | None = None):
+        self.estudo_id = estudo_id
+        self.intervalo = intervalo if intervalo is not None else float(
+            current_app.config.get('AI_STREAM_FLUSH_SECONDS', 0.5)
+        )
+        self._ultima_gravacao = 0.0
+        self._pendente = None
+
+    def __call__(self, texto: str):
+        agora = time.monotonic()
+        if agora - self._ultima_gravacao < self.intervalo:
+            self._pendente = texto
+            return
+        self._gravar(texto)
+        self._ultima_gravacao = agora
+
+    def concluir(self):
+        """Grava o último texto retido pelo intervalo."""
+        if self._pendente is not None:
+            self._gravar(self._pendente)
+
+    def _gravar(self, texto: str):
+        self._pendente = None
+        # Só enquanto processa: não sobrescreve um resultado já gravado
+        database.session.query(Estudo) \
+            .filter(Estudo.id == self.estudo_id, Estudo.status == 'processando') \
+            .update({Estudo.resumo: texto}, synchronize_session=False)
+        database.session.commit()
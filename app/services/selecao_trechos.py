@@ -0,0 +1,167 @@
+"""
+Seleção extrativa dos trechos enviados ao LLM.
+
+Quando os trechos de um documento passam do orçamento de tokens da etapa,
+todos são pontuados e só os mais informativos (até o orçamento) seguem para
+os prompts de resumo e de questões, na ordem original do documento.
+
+AI_SELECAO_TRECHOS escolhe a pontuação:
+
+- 'textrank' (padrão): PageRank sobre o grafo de similaridade de cosseno
+  TF-IDF entre os trechos, com salto proporcional ao grau. Trechos parecidos
+  com muitos outros tratam dos assuntos centrais do documento;
+- 'tfidf': similaridade de cada trecho com o centroide TF-IDF do documento;
+- 'uniforme': sem pontuação, amostra espaçada do início ao fim (o
+  comportamento anterior).
+
+A matriz de similaridade n x n nunca é montada: com as linhas normalizadas,
+S·v = X·(Xᵀ·v), então cada iteração custa O(n·termos) e o ranking de
+milhares de trechos leva poucos milissegundos; o custo dominante é separar
+as palavras (~0,1 s para um documento no teto de AI_EXTRACAO_MAX_TOKENS). O
+vocabulário é limitado aos AI_SELECAO_MAX_TERMOS termos presentes em mais
+trechos.
+"""
+import os
+import re
+from typing import List
+
+import numpy as np
+from flask import current_app
+
+from app.services.orcamento_tokens import estimar_tokens
+
+__all__ = ['METODOS_SELECAO', 'metodo_selecao', 'pontuar_trechos', 'selecionar_trechos']
+
+METODOS_SELECAO = ('textrank', 'tfidf', 'uniforme')
+
+_PALAVRA = re.compile(r'\w{3,}')
+
+
+def _cfg(key: str, default):
+    valor = current_app.config.get(key) if current_app else None
+    return valor if valor is not None else os.getenv(key, default)
+
+
+def _matriz_tfidf(trechos: List[str], max_termos: int) -> np.ndarray:
+    """Matriz trechos x termos (float32), TF-IDF com linhas de norma 1."""
+    n = len(trechos)
+    palavras = [_PALAVRA.findall(trecho.lower()) for trecho in trechos]
+    total = sum(len(lista) for lista in palavras)
+    if not total:
+        return np.zeros((n, 0), dtype=np.float32)
+
+    vocabulario = {}
+    termos = np.fromiter((vocabulario.setdefault(p, len(vocabulario)) for lista in palavras for p in lista),
+                         dtype=np.int64, count=total)
+    v = len(vocabulario)
+    linhas = np.repeat(np.arange(n, dtype=np.int64), [len(lista) for lista in palavras])
+    pares, contagens = np.unique(linhas * v + termos, return_counts=True)
+    linhas, colunas = np.divmod(pares, v)
+
+    # df: em quantos trechos cada termo aparece; idf = log(n/df) zera termos presentes em todos.
+    # Termos com dígitos (números de página, anos) não dizem do que o trecho trata.
+    df = np.bincount(colunas, minlength=v)
+    idf = np.log(n / df)
+    alfabeticos = np.fromiter((p.isalpha() for p in vocabulario), dtype=bool, count=v)
+    candidatos = np.flatnonzero(alfabeticos & (idf > 0))
+    mantidos = candidatos[np.argsort(-df[candidatos], kind='stable')[:max_termos]]
+    indice = np.full(v, -1, dtype=np.int64)
+    indice[mantidos] = np.arange(len(mantidos))
+
+    colunas = indice[colunas]
+    validos = colunas >= 0
+    matriz = np.zeros((n, len(mantidos)), dtype=np.float32)
+    matriz[linhas[validos], colunas[validos]] = contagens[validos]
+    # tf sublinear: um termo repetido 50 vezes não vale 50 termos distintos
+    np.log1p(matriz, out=matriz)
+    matriz *= idf[mantidos].astype(np.float32)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    np.divide(matriz, normas, out=matriz, where=normas > 0)
+    return matriz
+
+
+def _textrank(matriz: np.ndarray, amortecimento: float = 0.85, iteracoes: int = 50) -> np.ndarray:
+    """
+    PageRank sobre S = X·Xᵀ sem a diagonal, calculado como X·(Xᵀ·v).
+
+    O salto aleatório vai para cada trecho na proporção do seu grau, não de
+    forma uniforme: com o salto uniforme, grupos de trechos parecidos entre si
+    mas pouco ligados ao resto (sumário, referências, ficha catalográfica)
+    recebem por trecho a mesma relevância que o assunto principal.
+    """
+    n = matriz.shape[0]
+    normas = np.einsum('ij,ij->i', matriz, matriz)
+    grau = matriz @ matriz.sum(axis=0) - normas
+    total = grau.sum()
+    salto = grau / total if total > 0 else np.full(n, 1.0 / n, dtype=np.float32)
+    isolados = grau <= 0
+    grau[isolados] = 1.0
+
+    rank = salto
+    for _ in range(iteracoes):
+        peso = rank / grau
+        # Trechos sem vizinhos devolvem seu rank pelo salto (nó pendente do PageRank)
+        pendente = rank[isolados].sum()
+        novo = (1 - amortecimento + amortecimento * pendente) * salto \
+            + amortecimento * (matriz @ (matriz.T @ peso) - normas * peso)
+        if np.abs(novo - rank).sum() < 1e-6:
+            return novo
+        rank = novo
+    return rank
+
+
+def metodo_selecao(metodo: str | None = None) -> str:
+    """O método pedido ou o de AI_SELECAO_TRECHOS, validado."""
+    metodo = metodo or _cfg('AI_SELECAO_TRECHOS', 'textrank')
+    if metodo not in METODOS_SELECAO:
+        raise ValueError(f"AI_SELECAO_TRECHOS inválido: {metodo} (use {', '.join(METODOS_SELECAO)})")
+    return metodo
+
+
+def pontuar_trechos(trechos: List[str], metodo: str | None = None) -> np.ndarray:
+    """Relevância de cada trecho (maior = mais informativo) pelo método de AI_SELECAO_TRECHOS."""
+    metodo = metodo_selecao(metodo)
+    if metodo == 'uniforme' or len(trechos) < 3:
+        return np.zeros(len(trechos), dtype=np.float32)
+
+    matriz = _matriz_tfidf(trechos, int(_cfg('AI_SELECAO_MAX_TERMOS', 2048)))
+    if metodo == 'tfidf':
+        centroide = matriz.sum(axis=0)
+        return matriz @ (centroide / (np.linalg.norm(centroide) or 1.0))
+    return _textrank(matriz)
+
+
+def _amostra_uniforme(trechos: List[str], tokens: List[int], max_tokens: int) -> List[str]:
+    total = sum(tokens)
+    quantidade = max(1, int(len(trechos) * max_tokens / total))
+    passo = len(trechos) / quantidade
+    return [trechos[int(i * passo)] for i in range(quantidade)]
+
+
+def selecionar_trechos(trechos: List[str], max_tokens: int, metodo: str | None = None) -> List[str]:
+    """
+    Os trechos de maior relevância cuja soma de tokens cabe em max_tokens,
+    na ordem do documento. Se todos cabem, são devolvidos sem pontuar.
+    """
+    tokens = [estimar_tokens(t) for t in trechos]
+    if sum(tokens) <= max_tokens:
+        return trechos
+
+    metodo = metodo_selecao(metodo)
+    if metodo == 'uniforme':
+        return _amostra_uniforme(trechos, tokens, max_tokens)
+
+    pontos = pontuar_trechos(trechos, metodo)
+    if not pontos.any():
+        # Nada a distinguir os trechos (poucos trechos, sem vocabulário): cobre o documento
+        return _amostra_uniforme(trechos, tokens, max_tokens)
+    escolhidos = []
+    usados = 0
+    # Estável: em empate prevalece a ordem do documento
+    for i in np.argsort(-pontos, kind='stable'):
+        if usados + tokens[i] <= max_tokens:
+            escolhidos.append(i)
+            usados += tokens[i]
+    if not escolhidos:
+        escolhidos = [int(np.argmax(pontos))]
+    return [trechos[i] for i in sorted(escolhidos)]
@@ -1 +1,3 @@
-from app.utils.validator import *
\ No newline at end of file
+from app.utils.validator import *
+from app.utils.cache import *
+from app.utils.texto import *
\ No newline at end of file
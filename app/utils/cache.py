@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ['TTLCache']
+
+_AUSENTE = object()
+
+
+class TTLCache:
+    """
+    Cache LRU em memória, limitado em número de itens e com expiração (TTL).
+    Seguro para uso entre threads; é local a cada processo.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave, default=None):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is not _AUSENTE:
+                expira_em, valor = item
+                if expira_em > agora:
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return valor
+                del self._itens[chave]
+            self.misses += 1
+            return default
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maxsize:
+                self._itens.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._itens),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
@@ -0,0 +1,22 @@
+import re
+import unicodedata
+
+__all__ = ['normalizar_resposta', 'somente_digitos']
+
+
+def normalizar_resposta(texto):
+    """
+    Chave de comparação de respostas: Unicode NFC, espaços colapsados e
+    caixa ignorada. Retorna None para valores vazios.
+    """
+    if texto is None:
+        return None
+    chave = ' '.join(unicodedata.normalize('NFC', str(texto)).split()).casefold()
+    return chave or None
+
+
+def somente_digitos(texto):
+    """Remove tudo que não for dígito (CPF, telefone). Retorna None se não sobrar nada."""
+    if texto is None:
+        return None
+    return re.sub(r'\D', '', str(texto)) or None
@@ -0,0 +1,82 @@
+"""
+Benchmark da extração de PDF: carregador antigo (PyPDFLoader, todas as
+páginas em memória) contra app.services.extracao.extrair_texto em série,
+com pool de processos e com orçamento de tokens.
+
+O PDF é gerado por scripts/corpus_sintetico.py (sem dependências extras).
+Cada modo roda num subprocesso próprio para que o pico de RSS seja dele; o
+cache de extração fica desligado.
+
+Uso: python scripts/bench_extracao.py [--paginas 500] [--orcamento 60000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MODOS = ('pypdfloader', 'serie', 'processos', 'orcamento')
+
+
+def _medir(modo: str, caminho: str, processos: int, orcamento: int):
+    os.environ.update(SECRET_KEY=os.getenv('SECRET_KEY', 'bench'), AI_EXTRACAO_CACHE='False')
+    from app import app
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with app.app_context():
+        app.config['AI_EXTRACAO_PROCESSOS'] = processos if modo == 'processos' else 1
+        inicio = time.perf_counter()
+        if modo == 'pypdfloader':
+            from langchain_community.document_loaders import PyPDFLoader
+            documentos = PyPDFLoader(caminho).load()
+            texto = " ".join(d.page_content for d in documentos)
+            paginas = len(documentos)
+        else:
+            from app.services.extracao import extrair_texto
+            texto = extrair_texto(caminho, max_tokens=orcamento if modo == 'orcamento' else 10 ** 9)
+            paginas = texto.count("\n\n") + 1
+        segundos = time.perf_counter() - inicio
+
+    from app.services import extracao
+    if extracao._pool is not None:
+        # RUSAGE_CHILDREN só conta processos já encerrados
+        extracao._pool.shutdown()
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(f"{modo:12s} {paginas:5d} págs {segundos:7.2f} s {paginas / segundos:7.1f} págs/s "
+          f"RSS pico +{(pico - base) / 1024:6.1f} MB (filhos {filhos / 1024:.1f} MB) {len(texto)} chars")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--paginas', type=int, default=500)
+    parser.add_argument('--processos', type=int, default=2)
+    parser.add_argument('--orcamento', type=int, default=60000, help='max_tokens do modo orcamento')
+    parser.add_argument('--pdf', help='PDF já existente (senão um é gerado)')
+    parser.add_argument('--modo', choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        _medir(args.modo, args.pdf, args.processos, args.orcamento)
+        return
+
+    caminho = args.pdf
+    if not caminho:
+        from corpus_sintetico import gerar_pdf
+        caminho = os.path.join(tempfile.mkdtemp(), f'livro_{args.paginas}p.pdf')
+        gerar_pdf(caminho, args.paginas)
+    print(f"{caminho}: {os.path.getsize(caminho) / 1e6:.1f} MB")
+
+    for modo in MODOS:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--modo', modo, '--pdf', caminho,
+                        '--processos', str(args.processos), '--orcamento', str(args.orcamento)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark dos extratores por formato (app.services.extracao.iterar_paginas)
+sobre o corpus de scripts/corpus_sintetico.py: PDF, DOCX de três tamanhos
+e o mesmo texto em UTF-8, Latin-1 e UTF-16.
+
+Com --antes, mede também os caminhos anteriores ao registro de formatos:
+UnstructuredWordDocumentLoader para DOCX (baixa um modelo spaCy no
+primeiro uso; sem rede, falha) e leitura fixa em UTF-8 para TXT.
+
+Uso: python scripts/bench_formatos.py [--destino DIR] [--paginas 200] [--antes]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _docx_antes(caminho: str):
+    from langchain_community.document_loaders import UnstructuredWordDocumentLoader
+    for documento in UnstructuredWordDocumentLoader(caminho).lazy_load():
+        yield documento.page_content
+
+
+def _txt_antes(caminho: str):
+    with open(caminho, encoding='utf-8') as arquivo:
+        while True:
+            bloco = arquivo.read(65536)
+            if not bloco:
+                return
+            yield bloco + arquivo.readline()
+
+
+def _medir(extrator, caminho: str) -> str:
+    inicio = time.perf_counter()
+    try:
+        caracteres = sum(len(texto) for texto in extrator(caminho))
+    except Exception as erro:
+        return f"falha: {type(erro).__name__}"
+    segundos = time.perf_counter() - inicio
+    megabytes = os.path.getsize(caminho) / 1e6
+    return f"{segundos * 1000:8.0f} ms {megabytes / segundos:7.1f} MB/s ({caracteres} chars)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--destino', help='diretório do corpus (reaproveitado se já existir)')
+    parser.add_argument('--paginas', type=int, default=200, help='páginas do PDF gerado')
+    parser.add_argument('--antes', action='store_true', help='mede também os extratores anteriores')
+    args = parser.parse_args()
+
+    from corpus_sintetico import gerar_corpus
+
+    destino = args.destino or tempfile.mkdtemp()
+    caminhos = gerar_corpus(destino, args.paginas)
+
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    from app import app
+    from app.services.extracao import iterar_paginas
+
+    with app.app_context():
+        for caminho in caminhos:
+            # Aquecimento: o primeiro uso de cada formato importa o leitor
+            _medir(iterar_paginas, caminho)
+            linha = f"{os.path.basename(caminho):18s} {_medir(iterar_paginas, caminho)}"
+            if args.antes and not caminho.endswith('.pdf'):
+                antes = _docx_antes if caminho.endswith('.docx') else _txt_antes
+                linha += f" | antes {_medir(antes, caminho)}"
+            print(linha)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark do acesso a Questao.opcoes numa renderização de estudo.
+
+Compara as linhas no formato antigo (opcoes_json com o texto JSON, que
+precisa de json.loads a cada acesso) com o formato nativo gravado desde a
+m0005 (lista na coluna JSON/JSONB). Roda num SQLite temporário.
+
+Uso: python scripts/bench_opcoes_json.py [--questoes 50] [--renders 200]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questoes', type=int, default=50)
+    parser.add_argument('--renders', type=int, default=200)
+    args = parser.parse_args()
+
+    banco = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.update(SECRET_KEY=os.getenv('SECRET_KEY', 'bench'), DATABASE_URL=f'sqlite:///{banco}')
+
+    from app import app, database, migrations
+    from app.models import Estudo, Questao, Usuario
+
+    opcoes = ['Opção A ' * 6, 'Opção B ' * 5, 'Opção C ' * 5, 'Opção D ' * 5]
+    with app.app_context():
+        migrations.upgrade(database.engine, log=lambda *a: None)
+        usuario = Usuario(nome='Bench', cpf='00000000000', whatsapp='0', email='bench@exemplo.com', senha='x')
+        database.session.add(usuario)
+        database.session.flush()
+
+        estudos = {}
+        for formato, valor in (('legado', json.dumps(opcoes)), ('nativo', opcoes)):
+            estudo = Estudo(user_id=usuario.id, titulo=formato, resumo='')
+            database.session.add(estudo)
+            database.session.flush()
+            for _ in range(args.questoes):
+                database.session.add(Questao(estudo_id=estudo.id, pergunta='p' * 200, opcoes_json=valor,
+                                             resposta_correta=opcoes[0]))
+            estudos[formato] = estudo.id
+        database.session.commit()
+
+        for formato, estudo_id in estudos.items():
+            questoes = database.session.get(Estudo, estudo_id).questoes.all()
+            inicio = time.perf_counter()
+            for _ in range(args.renders):
+                # O template lê as opções duas vezes por questão (lista e gabarito)
+                for questao in questoes:
+                    for _opcao in questao.opcoes:
+                        pass
+                    for _opcao in questao.opcoes:
+                        pass
+            por_render = (time.perf_counter() - inicio) / args.renders
+            print(f"{formato:7s} {args.questoes} questões: {por_render * 1e6:8.1f} µs por renderização")
+            database.session.expire_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Corpus sintético para os benchmarks de scripts/: PDF gerado sem
+dependências extras (PDF mínimo com fonte Helvetica/WinAnsi), DOCX com
+títulos, parágrafos e tabelas (python-docx) e TXT em várias codificações.
+
+Uso direto: python scripts/corpus_sintetico.py DESTINO [--paginas 500]
+"""
+import argparse
+import os
+import random
+
+PALAVRAS = (
+    "aprendizagem estudo célula mitocôndria energia função revisão conceito definição exemplo "
+    "método análise síntese proteína membrana núcleo enzima metabolismo fotossíntese cloroplasto "
+    "divisão mitose meiose cromossomo genética herança evolução seleção população ecossistema "
+    "cadeia alimentar água carbono nitrogênio respiração glicose oxigênio transporte difusão osmose"
+).split()
+
+LINHAS_POR_PAGINA = 48
+CARACTERES_POR_LINHA = 95
+
+
+def frase(rng: random.Random, palavras: int = 14) -> str:
+    return " ".join(rng.choice(PALAVRAS) for _ in range(palavras)).capitalize() + "."
+
+
+def linhas_pagina(rng: random.Random) -> list:
+    linhas = []
+    atual = ""
+    while len(linhas) < LINHAS_POR_PAGINA:
+        atual = (atual + " " + frase(rng)).strip()
+        while len(atual) > CARACTERES_POR_LINHA:
+            corte = atual.rfind(" ", 0, CARACTERES_POR_LINHA)
+            linhas.append(atual[:corte])
+            atual = atual[corte + 1:]
+    return linhas[:LINHAS_POR_PAGINA]
+
+
+def _literal_pdf(texto: str) -> bytes:
+    dados = texto.encode('cp1252', errors='replace')
+    return b"(" + dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def gerar_pdf(caminho: str, paginas: int = 500, semente: int = 1):
+    """PDF de 'paginas' páginas A4 com ~48 linhas de texto corrido cada."""
+    rng = random.Random(semente)
+    objetos = []  # conteúdo de cada objeto, numerados a partir de 1
+
+    def adicionar(conteudo: bytes) -> int:
+        objetos.append(conteudo)
+        return len(objetos)
+
+    catalogo = adicionar(b"")  # preenchido no fim
+    raiz_paginas = adicionar(b"")
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    filhos = []
+    for _ in range(paginas):
+        fluxo = b"BT /F1 10 Tf 12 TL 50 800 Td " + b" ".join(
+            _literal_pdf(linha) + b" Tj T*" for linha in linhas_pagina(rng)
+        ) + b" ET"
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        filhos.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (raiz_paginas, fonte, conteudo)
+        ))
+
+    objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % raiz_paginas
+    objetos[raiz_paginas - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % f for f in filhos), len(filhos))
+
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for numero, conteudo in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + conteudo + b"\nendobj\n"
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    saida += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, catalogo, xref)
+
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(saida)
+
+
+# (nome, parágrafos, tabelas)
+TAMANHOS_DOCX = (('pequeno', 60, 2), ('medio', 600, 20), ('grande', 3000, 100))
+CODIFICACOES_TXT = ('utf-8', 'latin-1', 'utf-16')
+
+
+def gerar_docx(caminho: str, paragrafos: int, tabelas: int, semente: int = 1):
+    """DOCX com um título a cada 10 parágrafos e tabelas 6x4 com uma célula mesclada."""
+    import docx
+
+    rng = random.Random(semente)
+    documento = docx.Document()
+    intervalo_tabelas = paragrafos // tabelas if tabelas else 0
+    for i in range(paragrafos):
+        if i % 10 == 0:
+            documento.add_heading(frase(rng, 5), level=2)
+        documento.add_paragraph(" ".join(frase(rng, 18) for _ in range(4)))
+        if intervalo_tabelas and i % intervalo_tabelas == 0:
+            tabela = documento.add_table(rows=6, cols=4)
+            for linha in tabela.rows:
+                for celula in linha.cells:
+                    celula.text = frase(rng, 3)
+            tabela.cell(0, 0).merge(tabela.cell(0, 1))
+    documento.save(caminho)
+
+
+def gerar_txt(caminho: str, encoding: str, linhas: int = 40000, semente: int = 1):
+    rng = random.Random(semente)
+    texto = "\n".join(" ".join(frase(rng, 18) for _ in range(3)) for _ in range(linhas))
+    with open(caminho, 'w', encoding=encoding) as arquivo:
+        arquivo.write(texto)
+
+
+def gerar_corpus(destino: str, paginas_pdf: int = 500) -> list:
+    """Gera o corpus completo em 'destino' e devolve os caminhos."""
+    os.makedirs(destino, exist_ok=True)
+    caminhos = [os.path.join(destino, f'livro_{paginas_pdf}p.pdf')]
+    gerar_pdf(caminhos[0], paginas_pdf)
+    for nome, paragrafos, tabelas in TAMANHOS_DOCX:
+        caminhos.append(os.path.join(destino, f'{nome}.docx'))
+        gerar_docx(caminhos[-1], paragrafos, tabelas)
+    for encoding in CODIFICACOES_TXT:
+        caminhos.append(os.path.join(destino, f'texto_{encoding}.txt'))
+        gerar_txt(caminhos[-1], encoding)
+    return caminhos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('destino')
+    parser.add_argument('--paginas', type=int, default=500)
+    args = parser.parse_args()
+    for caminho in gerar_corpus(args.destino, args.paginas):
+        print(caminho)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Teste de estresse de concorrência no banco compartilhado pelo web e pelo
+worker de IA (docker-compose monta o mesmo instance/projeto.db nos dois).
+
+Dois processos, como os dois contêineres, cada um com --threads threads:
+- web: cria estudos (status 'processando') e lê o painel do usuário;
+- worker: pega estudos em processamento, grava as questões e marca 'pronto'.
+Ao fim, falha (código 1) se alguma escrita recebeu 'database is locked' ou
+se os agregados (questoes_total, métricas por status) não batem com as
+tabelas.
+
+Uso: python scripts/stress_sqlite.py [--threads 4] [--segundos 10] [--url sqlite:////tmp/x.db]
+     SQLITE_JOURNAL_MODE=DELETE SQLITE_BUSY_TIMEOUT_MS=0 python scripts/stress_sqlite.py  # perfil antigo
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+QUESTOES_POR_ESTUDO = 10
+
+
+def _app(url: str):
+    os.environ.update(SECRET_KEY=os.getenv('SECRET_KEY', 'stress'), DATABASE_URL=url)
+    from app import app
+    return app
+
+
+def _papel_web(indice: int, fim: float, usuario_id: int, contagem: dict):
+    from app import database
+    from app.models import Estudo
+    from app.services.metricas import registrar_estudo_criado
+
+    while time.time() < fim:
+        estudo = Estudo(user_id=usuario_id, titulo=f'web-{indice}', resumo='', status='processando')
+        database.session.add(estudo)
+        database.session.flush()
+        registrar_estudo_criado(estudo.status)
+        database.session.commit()
+        contagem['escritas'] += 1
+        # Leitura do painel: estudos recentes do usuário
+        database.session.query(Estudo.id, Estudo.status, Estudo.questoes_total) \
+            .filter(Estudo.user_id == usuario_id).order_by(Estudo.data_criacao.desc()).limit(20).all()
+        database.session.commit()
+        contagem['leituras'] += 1
+
+
+def _papel_worker(indice: int, threads: int, fim: float, contagem: dict):
+    from app import database
+    from app.models import Estudo
+
+    questoes = [{'pergunta': f'Pergunta {i}?', 'opcoes': ['a', 'b', 'c', 'd'], 'resposta_correta': 'a'}
+                for i in range(QUESTOES_POR_ESTUDO)]
+    while time.time() < fim:
+        # Cada thread fica com os estudos de id ≡ indice (mod threads), como filas separadas
+        estudo = database.session.query(Estudo) \
+            .filter(Estudo.status == 'processando', Estudo.id % threads == indice) \
+            .order_by(Estudo.id).first()
+        if estudo is None:
+            database.session.commit()
+            time.sleep(0.01)
+            continue
+        estudo.registrar_questoes(questoes)
+        estudo.resumo = 'Resumo gerado.'
+        estudo.status = 'pronto'
+        database.session.commit()
+        contagem['escritas'] += 1
+
+
+def _executar_papel(papel: str, url: str, threads: int, segundos: float, usuario_id: int):
+    """Roda as threads de um papel neste processo e imprime a contagem em JSON."""
+    app = _app(url)
+    from app import database
+
+    fim = time.time() + segundos
+    contagens = [{'escritas': 0, 'leituras': 0, 'bloqueios': 0, 'erros': []} for _ in range(threads)]
+
+    def rodar(indice):
+        contagem = contagens[indice]
+        with app.app_context():
+            while time.time() < fim:
+                try:
+                    if papel == 'web':
+                        _papel_web(indice, fim, usuario_id, contagem)
+                    else:
+                        _papel_worker(indice, threads, fim, contagem)
+                except Exception as e:
+                    database.session.rollback()
+                    if 'database is locked' in str(e):
+                        contagem['bloqueios'] += 1
+                    else:
+                        contagem['erros'].append(f"{type(e).__name__}: {e}"[:200])
+            database.session.remove()
+
+    trabalhadores = [threading.Thread(target=rodar, args=(i,)) for i in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+
+    print(json.dumps({
+        chave: (sum(len(c[chave]) for c in contagens) if chave == 'erros' else sum(c[chave] for c in contagens))
+        for chave in ('escritas', 'leituras', 'bloqueios', 'erros')
+    } | {'exemplos': [e for c in contagens for e in c['erros']][:3]}))
+
+
+def _preparar(url: str) -> int:
+    app = _app(url)
+    from app import database, migrations
+    from app.models import Usuario
+    from app.services.metricas import registrar_cadastro
+
+    with app.app_context():
+        migrations.upgrade(database.engine, log=lambda *a: None)
+        usuario = Usuario(nome='Stress', cpf='00000000000', whatsapp='0', email='stress@exemplo.com', senha='x')
+        database.session.add(usuario)
+        registrar_cadastro()
+        database.session.commit()
+        return usuario.id
+
+
+def _verificar(url: str) -> list:
+    """Inconsistências entre os agregados e as tabelas de origem."""
+    app = _app(url)
+    import sqlalchemy
+    from app import database
+    from app.models import Estudo, Questao
+    from app.services.metricas import reconciliar_metricas
+
+    problemas = []
+    with app.app_context():
+        divergentes = database.session.query(sqlalchemy.func.count()).select_from(Estudo).filter(
+            Estudo.questoes_total != database.session.query(sqlalchemy.func.count(Questao.id))
+            .filter(Questao.estudo_id == Estudo.id).scalar_subquery()
+        ).scalar()
+        if divergentes:
+            problemas.append(f"{divergentes} estudo(s) com questoes_total divergente")
+        with database.engine.begin() as conn:
+            for chave, (antes, depois) in reconciliar_metricas(conn).items():
+                problemas.append(f"métrica {chave}: {antes} != {depois}")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4, help='threads por processo')
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--url', help='banco de teste (padrão: SQLite temporário)')
+    parser.add_argument('--papel', choices=('web', 'worker'), help=argparse.SUPPRESS)
+    parser.add_argument('--usuario', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.papel:
+        _executar_papel(args.papel, args.url, args.threads, args.segundos, args.usuario)
+        return
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    usuario_id = _preparar(url)
+    print(f"{url}: 2 processos x {args.threads} threads por {args.segundos:.0f} s "
+          f"(journal_mode={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')})")
+
+    processos = {
+        papel: subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--papel', papel, '--url', url, '--usuario', str(usuario_id),
+             '--threads', str(args.threads), '--segundos', str(args.segundos)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        for papel in ('web', 'worker')
+    }
+    resultados = {}
+    for papel, processo in processos.items():
+        saida, _ = processo.communicate()
+        if processo.returncode:
+            sys.exit(f"processo {papel} terminou com código {processo.returncode}")
+        resultados[papel] = json.loads(saida.strip().splitlines()[-1])
+
+    falhou = False
+    for papel, r in resultados.items():
+        print(f"{papel:6s} {r['escritas'] / args.segundos:8.1f} escritas/s {r['leituras'] / args.segundos:8.1f} "
+              f"leituras/s  bloqueios={r['bloqueios']} erros={r['erros']}")
+        for exemplo in r['exemplos']:
+            print(f"       {exemplo}")
+        falhou |= bool(r['bloqueios'] or r['erros'])
+
+    problemas = _verificar(url)
+    for problema in problemas:
+        print(f"[FALHA] {problema}")
+    if falhou or problemas:
+        sys.exit(1)
+    print("OK: nenhum 'database is locked' e agregados consistentes.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Chama cada acessor do módulo deepseek como primeira operação de um
+processo novo e falha se algum não retornar em --timeout segundos.
+
+Um acessor que segura o _lock do módulo (não reentrante) e chama outro que
+também o adquire trava o processo para sempre na primeira chamada; no uso
+normal isso fica escondido porque chat() lê get_config() antes.
+
+Uso: python scripts/verificar_deepseek_init.py [--timeout 20]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ACESSORES = {
+    'get_config': "d.get_config()",
+    'get_client': "d.get_client()",
+    'get_cache_prompts': "d.get_cache_prompts()",
+    'get_async_client': "import asyncio\nasync def primeiro(): d.get_async_client()\nasyncio.run(primeiro())",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--timeout', type=float, default=20)
+    args = parser.parse_args()
+
+    temporario = tempfile.mkdtemp()
+    ambiente = {**os.environ, 'SECRET_KEY': os.getenv('SECRET_KEY', 'verificacao'),
+                'AI_PROMPT_CACHE_PATH': os.path.join(temporario, 'cache_prompts.sqlite3')}
+    falhas = 0
+    for nome, chamada in ACESSORES.items():
+        codigo = f"from app.integrations import deepseek as d\n{chamada}"
+        try:
+            resultado = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=ambiente,
+                                       capture_output=True, text=True, timeout=args.timeout)
+            ok = resultado.returncode == 0
+            detalhe = resultado.stderr.strip().splitlines()[-1] if not ok and resultado.stderr.strip() else ''
+        except subprocess.TimeoutExpired:
+            ok, detalhe = False, f"não retornou em {args.timeout:.0f} s (deadlock?)"
+        print(f"[{'OK' if ok else 'FALHA'}] {nome} {detalhe}".rstrip())
+        falhas += not ok
+    shutil.rmtree(temporario, ignore_errors=True)
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()